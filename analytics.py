@@ -0,0 +1,219 @@
+import numpy as np
+from sqlalchemy import select, func, case, literal
+from app import db
+from models import Evaluation, LLMResponse
+from rollups import RATED_FIELDS
+
+NUM_CATEGORIES = 5  # ratings are on a 1-5 scale; 0 marks a missing rating
+LOAD_BATCH_SIZE = 50000
+
+AGREEMENT_METRICS = ('interval', 'ordinal', 'nominal')
+
+
+def distinct_model_names():
+    """All model names in the corpus, with '' standing in for a missing name"""
+    return db.session.execute(
+        select(func.coalesce(LLMResponse.model_name, '')).distinct()
+    ).scalars().all()
+
+
+def model_code_expr(model_names):
+    """SQL expression mapping LLMResponse.model_name to its index in model_names"""
+    if not model_names:
+        return literal(-1)
+    return case({name: code for code, name in enumerate(model_names)},
+                value=func.coalesce(LLMResponse.model_name, ''), else_=-1)
+
+
+def load_ratings(model_name=None, session_ids=None):
+    """Load rating columns for all matching evaluations as NumPy arrays.
+
+    Runs one column-only query; model names are dictionary-encoded in SQL
+    so every fetched value is an integer. Returns a dict with int32
+    ``response_id``, ``session_id`` and ``model`` codes, an int8 array per
+    rated field, and ``model_names`` mapping codes back to names.
+    """
+    model_names = sorted(distinct_model_names())
+
+    query = select(
+        Evaluation.response_id,
+        Evaluation.session_id,
+        model_code_expr(model_names),
+        *[func.coalesce(getattr(Evaluation, name), 0) for name in RATED_FIELDS]
+    ).join(LLMResponse, LLMResponse.id == Evaluation.response_id)
+    if model_name is not None:
+        query = query.where(LLMResponse.model_name == model_name)
+    if session_ids:
+        query = query.where(Evaluation.session_id.in_(session_ids))
+
+    result = db.session.execute(query.execution_options(yield_per=LOAD_BATCH_SIZE))
+    chunks = [np.array(partition, dtype=np.int32) for partition in result.partitions()]
+    matrix = np.concatenate(chunks) if chunks else np.zeros((0, 3 + len(RATED_FIELDS)), dtype=np.int32)
+
+    columns = {
+        'response_id': matrix[:, 0],
+        'session_id': matrix[:, 1],
+        'model': matrix[:, 2],
+        'model_names': model_names,
+    }
+    for offset, name in enumerate(RATED_FIELDS, start=3):
+        columns[name] = matrix[:, offset].astype(np.int8)
+    return columns
+
+
+def _item_counts(items, values):
+    """Items x categories matrix of how often each item received each rating"""
+    valid = values > 0
+    _, item_index = np.unique(items[valid], return_inverse=True)
+    n_items = int(item_index.max()) + 1 if item_index.size else 0
+    flat = item_index * NUM_CATEGORIES + (values[valid].astype(np.int64) - 1)
+    counts = np.bincount(flat, minlength=n_items * NUM_CATEGORIES)
+    return counts.reshape(n_items, NUM_CATEGORIES).astype(np.float64)
+
+
+def _distance_matrix(marginals, metric):
+    categories = np.arange(1, NUM_CATEGORIES + 1, dtype=np.float64)
+    if metric == 'nominal':
+        return 1.0 - np.eye(NUM_CATEGORIES)
+    if metric == 'interval':
+        return (categories[:, None] - categories[None, :]) ** 2
+    # Ordinal: squared count of pairable values lying between the two ranks
+    cumulative = np.concatenate([[0.0], np.cumsum(marginals)])
+    low = np.minimum.outer(np.arange(NUM_CATEGORIES), np.arange(NUM_CATEGORIES))
+    high = np.maximum.outer(np.arange(NUM_CATEGORIES), np.arange(NUM_CATEGORIES))
+    between = cumulative[high + 1] - cumulative[low]
+    return (between - (marginals[:, None] + marginals[None, :]) / 2) ** 2
+
+
+def krippendorff_alpha(items, values, metric='interval'):
+    """Krippendorff's alpha for ratings of ``items``; None if undefined"""
+    counts = _item_counts(items, values)
+    pairable = counts.sum(axis=1)
+    counts = counts[pairable >= 2]
+    pairable = pairable[pairable >= 2]
+    if counts.size == 0:
+        return None
+
+    # Coincidence matrix o_ck = sum_u (n_uc * n_uk - [c == k] * n_uc) / (m_u - 1)
+    weighted = counts / (pairable - 1)[:, None]
+    coincidences = weighted.T @ counts - np.diag(weighted.sum(axis=0))
+    marginals = coincidences.sum(axis=1)
+    total = marginals.sum()
+
+    distance = _distance_matrix(marginals, metric)
+    observed = (coincidences * distance).sum() / total
+    expected = (np.outer(marginals, marginals) * distance).sum() / (total * (total - 1))
+    return float(1 - observed / expected) if expected > 0 else None
+
+
+def fleiss_kappa(items, values):
+    """Fleiss' kappa, generalized to a varying number of ratings per item"""
+    counts = _item_counts(items, values)
+    raters = counts.sum(axis=1)
+    counts = counts[raters >= 2]
+    raters = raters[raters >= 2]
+    if counts.size == 0:
+        return None
+
+    agreement = ((counts ** 2).sum(axis=1) - raters) / (raters * (raters - 1))
+    proportions = counts.sum(axis=0) / raters.sum()
+    chance = (proportions ** 2).sum()
+    return float((agreement.mean() - chance) / (1 - chance)) if chance < 1 else None
+
+
+def cohen_kappa(first, second):
+    """Cohen's kappa between two aligned arrays of ratings; None if undefined"""
+    valid = (first > 0) & (second > 0)
+    first = first[valid].astype(np.int64) - 1
+    second = second[valid].astype(np.int64) - 1
+    if first.size == 0:
+        return None
+
+    confusion = np.bincount(first * NUM_CATEGORIES + second,
+                            minlength=NUM_CATEGORIES ** 2).reshape(NUM_CATEGORIES, NUM_CATEGORIES)
+    total = confusion.sum()
+    observed = np.trace(confusion) / total
+    chance = (confusion.sum(axis=0) * confusion.sum(axis=1)).sum() / total ** 2
+    return float((observed - chance) / (1 - chance)) if chance < 1 else None
+
+
+def _paired_ratings(columns, name, first_session, second_session):
+    """Ratings two sessions gave to the responses both of them rated"""
+    sessions = columns['session_id']
+    first = sessions == first_session
+    second = sessions == second_session
+    shared, first_index, second_index = np.intersect1d(
+        columns['response_id'][first], columns['response_id'][second], return_indices=True)
+    return columns[name][first][first_index], columns[name][second][second_index]
+
+
+def agreement_report(columns, metric='interval', rater_pair=None):
+    """Per-criterion inter-rater agreement, treating sessions as raters"""
+    report = {}
+    for name in RATED_FIELDS:
+        values = columns[name]
+        criterion = {
+            'krippendorff_alpha': krippendorff_alpha(columns['response_id'], values, metric),
+            'fleiss_kappa': fleiss_kappa(columns['response_id'], values),
+        }
+        if rater_pair:
+            criterion['cohen_kappa'] = cohen_kappa(*_paired_ratings(columns, name, *rater_pair))
+        report[name] = criterion
+    return report
+
+
+def model_distributions(columns):
+    """Per-model rating counts, means and 1-5 histograms for each criterion"""
+    names = columns['model_names']
+    codes = columns['model']
+    report = {}
+    for code, model_name in enumerate(names):
+        report[model_name or 'unknown'] = {'evaluations': int((codes == code).sum())}
+
+    for name in RATED_FIELDS:
+        values = columns[name]
+        valid = (values > 0) & (codes >= 0)
+        flat = codes[valid].astype(np.int64) * NUM_CATEGORIES + values[valid] - 1
+        histograms = np.bincount(flat, minlength=len(names) * NUM_CATEGORIES) \
+            .reshape(len(names), NUM_CATEGORIES)
+        rated = histograms.sum(axis=1)
+        means = (histograms @ np.arange(1, NUM_CATEGORIES + 1)) / np.maximum(rated, 1)
+        for code, model_name in enumerate(names):
+            report[model_name or 'unknown'][name] = {
+                'mean': float(means[code]) if rated[code] else None,
+                'distribution': histograms[code].tolist(),
+            }
+    return report
+
+
+def analytics_report(metric='interval', model_name=None, rater_pair=None):
+    """The full /api/analytics payload: agreement per criterion and per-model distributions"""
+    columns = load_ratings(model_name=model_name)
+    return {
+        'total_ratings': int(columns['response_id'].size),
+        'metric': metric,
+        'agreement': agreement_report(columns, metric=metric, rater_pair=rater_pair),
+        'models': model_distributions(columns)
+    }
+
+
+def analytics_params(args):
+    """Validate analytics options from query args or a job's params.
+
+    Returns (keyword arguments for analytics_report, None) or (None, error message).
+    """
+    metric = args.get('metric') or 'interval'
+    if metric not in AGREEMENT_METRICS:
+        return None, f'Unsupported metric: {metric}'
+
+    rater_pair = None
+    raters = args.get('raters')
+    if raters:
+        try:
+            rater_pair = [int(r) for r in (raters.split(',') if isinstance(raters, str) else raters)]
+        except (TypeError, ValueError):
+            rater_pair = []
+        if len(rater_pair) != 2:
+            return None, 'raters must be two comma-separated session ids'
+
+    return {'metric': metric, 'model_name': args.get('model'), 'rater_pair': rater_pair}, None
@@ -5,37 +5,109 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+import routing
 
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={"class_": routing.RoutingSession})
+
+def create_app(config=None):
+    """Build the application.
+
+    Only configuration, extension and blueprint registration happen here;
+    no database work runs at startup. Create the schema and seed data with
+    the ``init-db`` and ``seed`` CLI commands.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1) # needed for url_for to generate with https
+
+    # configure the database, relative to the app instance folder
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    # connections per worker process: pool size, extra connections under load, and how long to wait for one
+    for option, variable in (("pool_size", "DB_POOL_SIZE"), ("max_overflow", "DB_MAX_OVERFLOW"),
+                             ("pool_timeout", "DB_POOL_TIMEOUT")):
+        if os.environ.get(variable):
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"][option] = int(os.environ[variable])
+
+    # read replica for routes marked read-only, and how long a browser's reads stay on the primary after it writes
+    app.config["REPLICA_DATABASE_URL"] = os.environ.get("REPLICA_DATABASE_URL")
+    app.config["REPLICA_LAG_SECONDS"] = float(os.environ.get("REPLICA_LAG_SECONDS", 10))
+
+    # work queue: ratings wanted per response and how long a claimed item stays reserved
+    app.config["RATINGS_PER_RESPONSE"] = int(os.environ.get("RATINGS_PER_RESPONSE", 3))
+    app.config["ASSIGNMENT_LEASE_SECONDS"] = int(os.environ.get("ASSIGNMENT_LEASE_SECONDS", 900))
+
+    # prompt and response text: compression for new blobs ("zlib", or "zstd" with the zstandard package),
+    # and how many decompressed texts, and how many bytes of them, each worker keeps
+    app.config["BLOB_COMPRESSION"] = os.environ.get("BLOB_COMPRESSION", "zlib")
+    app.config["BLOB_CACHE_ENTRIES"] = int(os.environ.get("BLOB_CACHE_ENTRIES", 10000))
+    app.config["BLOB_CACHE_BYTES"] = int(os.environ.get("BLOB_CACHE_BYTES", 32 * 1024 * 1024))
+
+    # near-duplicate detection: estimated Jaccard similarity at which a response joins a cluster
+    app.config["NEAR_DUPLICATE_THRESHOLD"] = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0.8))
+
+    # change feed: how old a row must be before /api/changes hands it out, so late commits are not skipped
+    app.config["CHANGES_SETTLE_SECONDS"] = float(os.environ.get("CHANGES_SETTLE_SECONDS", 10))
 
-# create the app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1) # needed for url_for to generate with https
+    # columnar ratings snapshot for offline analysis, and how old an evaluation must be before it is appended
+    app.config["SNAPSHOT_DIR"] = os.environ.get("SNAPSHOT_DIR", os.path.join(app.instance_path, "ratings_snapshot"))
+    app.config["SNAPSHOT_SETTLE_SECONDS"] = float(os.environ.get("SNAPSHOT_SETTLE_SECONDS", 10))
 
-# configure the database, relative to the app instance folder
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+    # background jobs: threads per web process (default 0 leaves jobs to one `flask run-jobs` process),
+    # lease renewed while a job runs, finished jobs and their files deleted after the retention period
+    app.config["JOB_WORKERS"] = int(os.environ.get("JOB_WORKERS", 0))
+    app.config["JOB_LEASE_SECONDS"] = int(os.environ.get("JOB_LEASE_SECONDS", 60))
+    app.config["JOB_RESULTS_DIR"] = os.environ.get("JOB_RESULTS_DIR", os.path.join(app.instance_path, "job_results"))
+    app.config["JOB_RETENTION_DAYS"] = float(os.environ.get("JOB_RETENTION_DAYS", 7))
 
-# initialize the app with the extension, flask-sqlalchemy >= 3.0.x
-db.init_app(app)
+    # read cache for the index and dashboard: "memory" (per worker) or "filesystem" (shared per host)
+    app.config["CACHE_BACKEND"] = os.environ.get("CACHE_BACKEND", "memory")
+    app.config["CACHE_DIR"] = os.environ.get("CACHE_DIR", os.path.join(app.instance_path, "cache"))
+    app.config["CACHE_TTL_SECONDS"] = int(os.environ.get("CACHE_TTL_SECONDS", 300))
+    app.config["CACHE_MAX_ENTRIES"] = int(os.environ.get("CACHE_MAX_ENTRIES", 256))
+
+    # SQL instrumentation: Server-Timing headers, N+1 warnings and /metrics
+    app.config["SQL_INSTRUMENTATION"] = os.environ.get("SQL_INSTRUMENTATION", "1") == "1"
+    app.config["SLOW_QUERY_MS"] = float(os.environ.get("SLOW_QUERY_MS", 100))
+    app.config["N_PLUS_ONE_THRESHOLD"] = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5))
+
+    if config:
+        app.config.update(config)
+
+    # Binds do not inherit SQLALCHEMY_ENGINE_OPTIONS, so the replica gets a copy
+    app.config.setdefault("SQLALCHEMY_BINDS", {})
+    if app.config["REPLICA_DATABASE_URL"]:
+        app.config["SQLALCHEMY_BINDS"][routing.REPLICA_BIND] = dict(app.config["SQLALCHEMY_ENGINE_OPTIONS"],
+                                                            url=app.config["REPLICA_DATABASE_URL"])
+
+    # Set up logging
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    # initialize the app with the extension, flask-sqlalchemy >= 3.0.x
+    db.init_app(app)
+    routing.init_app(app)
 
-with app.app_context():
     # Make sure to import the models here or their tables won't be created
     import models  # noqa: F401
-    import routes  # noqa: F401
-    
-    db.create_all()
-    
-    # Initialize sample data if database is empty
-    from sample_data import initialize_sample_data
-    initialize_sample_data()
+    import search  # noqa: F401  (full-text index tables are created with the models)
+    from routes import bp
+    from commands import register_commands
+
+    app.register_blueprint(bp)
+    register_commands(app)
+
+    if app.config["JOB_WORKERS"] > 0:
+        import jobs
+        jobs.init_app(app)
+
+    if app.config["SQL_INSTRUMENTATION"]:
+        import instrumentation
+        instrumentation.init_app(app)
+
+    return app
@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update, delete, func, or_, exists
+from sqlalchemy.orm import aliased
+from app import db
+from models import WorkItem, Evaluation, EvaluationSession, LLMResponse
+
+# Candidates fetched per claim round, and rounds before giving up under contention
+CLAIM_CANDIDATES = 8
+CLAIM_ROUNDS = 5
+ENQUEUE_BATCH_SIZE = 5000
+
+
+def _lease_duration():
+    return timedelta(seconds=current_app.config['ASSIGNMENT_LEASE_SECONDS'])
+
+
+def _available(now):
+    return or_(WorkItem.leased_until.is_(None), WorkItem.leased_until < now)
+
+
+def _candidates(session_id, now, limit):
+    """Open work items this session may take, lowest slot first.
+
+    Skips responses the session already rated or currently holds a lease
+    on. On PostgreSQL rows locked by a concurrent claim are skipped with
+    SKIP LOCKED; other backends ignore the locking clause and rely on the
+    compare-and-set in claim_next.
+    """
+    already_rated = exists().where(Evaluation.session_id == session_id,
+                                   Evaluation.response_id == WorkItem.response_id)
+    other = aliased(WorkItem)
+    already_leased = exists().where(other.session_id == session_id,
+                                    other.response_id == WorkItem.response_id,
+                                    other.leased_until >= now)
+    return select(WorkItem.id, WorkItem.response_id) \
+        .where(_available(now), ~already_rated, ~already_leased) \
+        .order_by(WorkItem.slot, WorkItem.response_id) \
+        .limit(limit) \
+        .with_for_update(skip_locked=True)
+
+
+def held_leases(session_id, now=None):
+    """Work items currently leased to a session, oldest lease first"""
+    now = now or datetime.utcnow()
+    return WorkItem.query.filter(WorkItem.session_id == session_id,
+                                 WorkItem.leased_until >= now) \
+        .order_by(WorkItem.leased_until, WorkItem.id).all()
+
+
+def claim_next(session_id):
+    """Lease the next response for a session and return its id.
+
+    A session that already holds a live lease gets that response back with
+    the lease renewed, so reloading the page does not burn work items.
+    Returns None when nothing is left for this session.
+    """
+    claimed = claim_many(session_id, 1)
+    return claimed[0] if claimed else None
+
+
+def claim_many(session_id, count):
+    """Lease up to ``count`` responses for a session and return their ids.
+
+    Live leases the session already holds come first, renewed, so clients
+    that prefetch can ask again without losing their place; new items are
+    claimed only to make up the difference. Returns fewer ids, possibly
+    none, when the queue runs dry, and none for a session that is no
+    longer in progress.
+    """
+    status = db.session.execute(
+        select(EvaluationSession.status).where(EvaluationSession.id == session_id)
+    ).scalar()
+    if status != 'in_progress':
+        return []
+
+    now = datetime.utcnow()
+    leased_until = now + _lease_duration()
+
+    held = held_leases(session_id, now)
+    if held:
+        db.session.execute(
+            update(WorkItem)
+            .where(WorkItem.id.in_([item.id for item in held]))
+            .values(leased_until=leased_until)
+        )
+    claimed = [item.response_id for item in held[:count]]
+
+    rounds = 0
+    while len(claimed) < count and rounds < CLAIM_ROUNDS:
+        candidates = db.session.execute(
+            _candidates(session_id, now, CLAIM_CANDIDATES + count - len(claimed))
+        ).all()
+        if not candidates:
+            break
+        # One slot per response, only as many as are still wanted
+        wanted = {}
+        for item_id, response_id in candidates:
+            if response_id not in claimed and response_id not in wanted:
+                wanted[response_id] = item_id
+        item_ids = list(wanted.values())[:count - len(claimed)]
+        # Compare-and-set for the whole round: items leased meanwhile are left out
+        won = db.session.execute(
+            update(WorkItem)
+            .where(WorkItem.id.in_(item_ids), _available(now))
+            .values(session_id=session_id, leased_until=leased_until)
+            .returning(WorkItem.response_id)
+        ).scalars().all()
+        claimed.extend(sorted(won, key=lambda response_id: item_ids.index(wanted[response_id])))
+        if not won:
+            rounds += 1
+    db.session.commit()
+    return claimed
+
+
+def complete_assignments(pairs):
+    """Retire the work items covered by newly submitted (session_id, response_id) pairs.
+
+    Prefers the item leased to the submitting session; if that lease is
+    gone, retires any unleased slot of the response instead. Looks up and
+    deletes the items for the whole batch at once. Runs in the caller's
+    transaction.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return
+    now = datetime.utcnow()
+    items = db.session.execute(
+        select(WorkItem.id, WorkItem.response_id, WorkItem.session_id, WorkItem.leased_until)
+        .where(WorkItem.response_id.in_({response_id for _, response_id in pairs}))
+        .order_by(WorkItem.slot, WorkItem.id)
+    ).all()
+
+    by_response = {}
+    for item in items:
+        by_response.setdefault(item.response_id, []).append(item)
+
+    taken = set()
+    retired = []
+    for session_id, response_id in pairs:
+        candidates = [item for item in by_response.get(response_id, ()) if item.id not in taken]
+        held = [item for item in candidates if item.session_id == session_id]
+        free = [item for item in candidates if item.leased_until is None or item.leased_until < now]
+        chosen = (held or free or [None])[0]
+        if chosen is not None:
+            taken.add(chosen.id)
+            retired.append(chosen.id)
+    if retired:
+        db.session.execute(delete(WorkItem).where(WorkItem.id.in_(retired)))
+
+
+def release_leases(session_id):
+    """Hand back every lease a session holds. Runs in the caller's transaction."""
+    db.session.execute(
+        update(WorkItem)
+        .where(WorkItem.session_id == session_id)
+        .values(session_id=None, leased_until=None)
+    )
+
+
+def enqueue_responses(response_ids=None):
+    """Top up work items so each cluster representative has its target
+    number of ratings either done or queued. Limited to ``response_ids``
+    when given.
+
+    Returns the number of work items added. Does not commit.
+    """
+    target = current_app.config['RATINGS_PER_RESPONSE']
+
+    rated = select(Evaluation.response_id, func.count()).group_by(Evaluation.response_id)
+    queued = select(WorkItem.response_id, func.count()).group_by(WorkItem.response_id)
+    # Near-duplicates are rated through their cluster representative
+    ids = select(LLMResponse.id).where(LLMResponse.duplicate_of.is_(None))
+    if response_ids is not None:
+        rated = rated.where(Evaluation.response_id.in_(response_ids))
+        queued = queued.where(WorkItem.response_id.in_(response_ids))
+        ids = ids.where(LLMResponse.id.in_(response_ids))
+
+    covered = dict(db.session.execute(rated).all())
+    for response_id, count in db.session.execute(queued):
+        covered[response_id] = covered.get(response_id, 0) + count
+
+    rows = []
+    added = 0
+    for response_id in db.session.execute(ids).scalars().all():
+        have = covered.get(response_id, 0)
+        rows.extend({'response_id': response_id, 'slot': slot} for slot in range(have, target))
+        if len(rows) >= ENQUEUE_BATCH_SIZE:
+            db.session.execute(WorkItem.__table__.insert(), rows)
+            added += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(WorkItem.__table__.insert(), rows)
+        added += len(rows)
+    return added
@@ -0,0 +1,167 @@
+from sqlalchemy import select, insert
+from wtforms import SelectField, BooleanField, HiddenField
+from wtforms.fields.core import UnboundField
+from wtforms.validators import DataRequired, InputRequired, Length
+from app import db
+from models import EvaluationSession, LLMResponse, Evaluation
+from forms import EvaluationForm
+from assignment import complete_assignments
+from cache import bump_data_version
+from rollups import apply_evaluations
+from search import index_evaluations
+
+MAX_BATCH_SIZE = 5000
+
+
+def _form_rules(form_class):
+    """Validation rules read once from a form class's field declarations.
+
+    Lets API payloads be checked against exactly the choices, lengths and
+    required flags of the HTML form without instantiating it per item.
+    """
+    rules = {}
+    for name in dir(form_class):
+        unbound = getattr(form_class, name)
+        if not isinstance(unbound, UnboundField):
+            continue
+        validators = unbound.kwargs.get('validators', [])
+        rule = {
+            'kind': unbound.field_class,
+            'required': any(isinstance(v, (DataRequired, InputRequired)) for v in validators),
+        }
+        if issubclass(unbound.field_class, SelectField):
+            rule['choices'] = {value for value, _ in unbound.kwargs['choices']}
+        for validator in validators:
+            if isinstance(validator, Length):
+                rule['min_length'], rule['max_length'] = validator.min, validator.max
+        rules[name] = rule
+    return rules
+
+
+EVALUATION_RULES = _form_rules(EvaluationForm)
+
+
+def _check_field(rule, value):
+    """Error message for one field value, or None if it is valid"""
+    if value is None or value == '':
+        return 'This field is required.' if rule['required'] else None
+
+    kind = rule['kind']
+    if issubclass(kind, BooleanField):
+        return None if isinstance(value, bool) else 'Must be true or false.'
+    if issubclass(kind, (SelectField, HiddenField)):
+        if isinstance(value, bool) or not isinstance(value, int):
+            return 'Must be an integer.'
+        if 'choices' in rule and value not in rule['choices']:
+            return 'Not a valid choice.'
+        return None
+
+    if not isinstance(value, str):
+        return 'Must be a string.'
+    if rule.get('max_length', -1) != -1 and len(value) > rule['max_length']:
+        return f"Field cannot be longer than {rule['max_length']} characters."
+    if rule.get('min_length', -1) > len(value):
+        return f"Field must be at least {rule['min_length']} characters long."
+    return None
+
+
+def validate_item(item):
+    """Return (row, errors) for one submitted evaluation"""
+    if not isinstance(item, dict):
+        return None, {'item': ['Must be an object.']}
+
+    errors = {}
+    row = {}
+    for name, rule in EVALUATION_RULES.items():
+        value = item.get(name)
+        message = _check_field(rule, value)
+        if message:
+            errors[name] = [message]
+        elif issubclass(rule['kind'], BooleanField):
+            row[name] = bool(value)
+        else:
+            row[name] = value if value != '' else None
+    unknown = set(item) - set(EVALUATION_RULES)
+    if unknown:
+        errors['item'] = [f"Unknown fields: {', '.join(sorted(unknown))}"]
+    return (None, errors) if errors else (row, None)
+
+
+def _existing_ids(model, ids):
+    if not ids:
+        return set()
+    return set(db.session.execute(select(model.id).where(model.id.in_(ids))).scalars())
+
+
+def _pair_rows(rows, *columns):
+    """Stored evaluations whose (session_id, response_id) may match ``rows``"""
+    if not rows:
+        return []
+    session_ids = {row['session_id'] for row in rows}
+    response_ids = {row['response_id'] for row in rows}
+    return db.session.execute(
+        select(Evaluation.session_id, Evaluation.response_id, *columns)
+        .where(Evaluation.session_id.in_(session_ids), Evaluation.response_id.in_(response_ids))
+    ).all()
+
+
+def submit_batch(items, all_or_nothing=False):
+    """Validate and insert many evaluations in one transaction.
+
+    Invalid items are reported by index with per-field messages; the rest
+    are inserted with a single executemany, and the session rollups, work
+    queue and data version are updated in the same transaction. With
+    ``all_or_nothing`` any error rejects the whole batch.
+    """
+    errors = []
+    candidates = []
+    for index, item in enumerate(items):
+        row, item_errors = validate_item(item)
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+        else:
+            candidates.append((index, row))
+
+    # Referential and uniqueness checks, a constant number of queries per batch
+    sessions = _existing_ids(EvaluationSession, {row['session_id'] for _, row in candidates})
+    responses = _existing_ids(LLMResponse, {row['response_id'] for _, row in candidates})
+    stored = {(row.session_id, row.response_id) for row in _pair_rows([row for _, row in candidates])}
+    seen = set()
+    accepted = []
+    for index, row in candidates:
+        pair = (row['session_id'], row['response_id'])
+        item_errors = {}
+        if row['session_id'] not in sessions:
+            item_errors['session_id'] = ['Unknown session.']
+        if row['response_id'] not in responses:
+            item_errors['response_id'] = ['Unknown response.']
+        if pair in stored or pair in seen:
+            item_errors['response_id'] = item_errors.get('response_id', []) + \
+                ['Already evaluated in this session.']
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+        else:
+            seen.add(pair)
+            accepted.append(row)
+    errors.sort(key=lambda error: error['index'])
+
+    if not accepted or (errors and all_or_nothing):
+        db.session.rollback()
+        return {'inserted': 0, 'ids': [], 'errors': errors}
+
+    try:
+        db.session.execute(insert(Evaluation), accepted)
+        # (session_id, response_id) is unique, so it maps the new ids back to
+        # their items without a per-row RETURNING round trip
+        new_ids = {(row.session_id, row.response_id): row.id for row in _pair_rows(accepted, Evaluation.id)}
+        ids = [new_ids[(row['session_id'], row['response_id'])] for row in accepted]
+        apply_evaluations(accepted)
+        index_evaluations([dict(row, id=evaluation_id) for row, evaluation_id in zip(accepted, ids)])
+        complete_assignments([(row['session_id'], row['response_id']) for row in accepted])
+        bump_data_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {'inserted': len(ids), 'ids': ids, 'errors': errors}
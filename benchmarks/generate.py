@@ -0,0 +1,221 @@
+"""Build a synthetic corpus of responses, sessions and evaluations.
+
+Rows are written with Core executemany in batches, then the derived data
+the app keeps alongside them (session rollups, work queue, search index
+and data version) is rebuilt the same way the maintenance commands do.
+Example:
+
+    python -m benchmarks.generate --database-url sqlite:///bench.db \\
+        --responses 1000000 --sessions 100000 --evaluations 5000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+BATCH_SIZE = 20000
+MODELS = ['GPT-4', 'Claude-3', 'Gemini Pro', 'Llama-3-70B', 'Mistral Large', 'Command R+']
+TOPICS = ['anxiety', 'sleep', 'nutrition', 'taxes', 'python', 'databases', 'travel', 'parenting',
+          'chemistry', 'history', 'budgeting', 'exercise', 'medication', 'contracts', 'gardening']
+PROMPT_TEMPLATES = [
+    'How can I get better at {topic}?',
+    'Explain {topic} to a beginner.',
+    'What are common mistakes people make with {topic}?',
+    'Summarise the current advice on {topic}.',
+    'Is it safe to ignore problems with {topic}?',
+]
+WORDS = ('the a to of and in is that for it with as on be this are or by can you your more '
+         'about when should may also which these like other some time most first over before '
+         'important approach consider example steps help common risk advice professional research '
+         'evidence study recommend experts general practice simple clear useful safe careful '
+         'better improve understand explain avoid check ensure start build plan track review').split()
+NOTES = ['Clear and well structured.', 'Misses important caveats.', 'Tone is a little dismissive.',
+         'Cites statistics that look fabricated.', 'Should recommend seeing a professional.',
+         'Accurate but too long.', 'Invents a study that does not exist.', 'Good empathy throughout.']
+SAFETY_NOTES = ['Could encourage risky behaviour without a disclaimer.',
+                'Gives dosage advice without qualification.']
+HALLUCINATIONS = ['Fabricated citation.', 'Made-up statistics about outcomes.',
+                  'Claims a non-existent product feature.']
+
+
+def _batches(total, size=BATCH_SIZE):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+def _timed(label, started):
+    print(f'{label} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+
+def generate_responses(db, LLMResponse, count, rng, now):
+    from blobs import store_texts
+    topics = rng.integers(len(TOPICS), size=count)
+    templates = rng.integers(len(PROMPT_TEMPLATES), size=count)
+    models = rng.integers(len(MODELS), size=count)
+    lengths = rng.integers(40, 200, size=count)
+    table = LLMResponse.__table__
+    for start, size in _batches(count):
+        words = rng.integers(len(WORDS), size=int(lengths[start:start + size].sum()))
+        offset = 0
+        rows = []
+        texts = []
+        for i in range(start, start + size):
+            topic = TOPICS[topics[i]]
+            prompt = PROMPT_TEMPLATES[templates[i]].format(topic=topic) + f' (case {i})'
+            body = ' '.join(WORDS[w] for w in words[offset:offset + lengths[i]])
+            offset += lengths[i]
+            response = f'On {topic}: {body}.'
+            model_name = MODELS[models[i]]
+            texts += [prompt, response]
+            rows.append({
+                'model_name': model_name,
+                'content_hash': LLMResponse.compute_hash(prompt, response, model_name),
+                'created_at': now - timedelta(seconds=int(count - i)),
+            })
+        hashes = store_texts(texts)
+        for j, row in enumerate(rows):
+            row['prompt_hash'], row['response_hash'] = hashes[2 * j], hashes[2 * j + 1]
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def generate_sessions(db, EvaluationSession, count, rng, now):
+    completed = rng.random(count) < 0.7
+    ages = np.sort(rng.integers(0, 365 * 24 * 3600, size=count))[::-1]
+    table = EvaluationSession.__table__
+    for start, size in _batches(count):
+        rows = []
+        for i in range(start, start + size):
+            created_at = now - timedelta(seconds=int(ages[i]))
+            rows.append({
+                'evaluator_name': f'rater-{i % 5000:04d}',
+                'created_at': created_at,
+                'completed_at': created_at + timedelta(hours=2) if completed[i] else None,
+                'status': 'completed' if completed[i] else 'in_progress',
+            })
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def _notes(rng, choices, probability, size):
+    picked = rng.integers(len(choices), size=size)
+    present = rng.random(size) < probability
+    return [choices[p] if keep else None for p, keep in zip(picked, present)]
+
+
+def generate_evaluations(db, Evaluation, count, response_ids, session_ids, rng, now):
+    """Spread ``count`` evaluations over the sessions, each session rating
+    distinct responses; ratings follow a per-response quality with rater noise."""
+    quality = rng.normal(3.4, 0.9, size=len(response_ids))
+    per_session = rng.multinomial(count, np.full(len(session_ids), 1 / len(session_ids)))
+    per_session = np.minimum(per_session, len(response_ids))
+    table = Evaluation.__table__
+    criteria = ['helpfulness', 'correctness', 'coherence', 'empathy_tone', 'safety', 'overall_rating']
+
+    rows = []
+    written = 0
+    for session_index, session_id in enumerate(session_ids):
+        wanted = int(per_session[session_index])
+        if not wanted:
+            continue
+        picked = np.unique(rng.integers(len(response_ids), size=wanted))
+        while len(picked) < wanted:
+            picked = np.unique(np.concatenate([picked, rng.integers(len(response_ids), size=wanted - len(picked))]))
+        ratings = np.clip(np.rint(quality[picked][:, None] + rng.normal(0, 0.8, size=(len(picked), len(criteria)))), 1, 5)
+        notes = _notes(rng, NOTES, 0.3, len(picked))
+        safety_notes = _notes(rng, SAFETY_NOTES, 0.05, len(picked))
+        hallucinations = _notes(rng, HALLUCINATIONS, 0.08, len(picked))
+        revisions = rng.random(len(picked)) < 0.15
+        for j, response_index in enumerate(picked):
+            row = {name: int(ratings[j, k]) for k, name in enumerate(criteria)}
+            row.update(
+                session_id=int(session_id),
+                response_id=int(response_ids[response_index]),
+                evaluator_notes=notes[j],
+                safety_concerns=safety_notes[j],
+                hallucination_flags=hallucinations[j],
+                requires_revision=bool(revisions[j]),
+                created_at=now - timedelta(seconds=count - written - len(rows)),
+            )
+            rows.append(row)
+        if len(rows) >= BATCH_SIZE:
+            db.session.execute(table.insert(), rows)
+            db.session.commit()
+            written += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+        written += len(rows)
+    return written
+
+
+def generate(responses, sessions, evaluations, seed=0, search_index=True):
+    """Fill the current app's database; returns the row counts written"""
+    from app import db
+    from models import LLMResponse, EvaluationSession, Evaluation
+    from assignment import enqueue_responses
+    from cache import bump_data_version
+    from rollups import rebuild_session_stats
+    from search import rebuild_search_index
+
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    db.create_all()
+    if db.session.query(LLMResponse.id).first() is not None:
+        raise SystemExit('The database already holds responses; generate into an empty database')
+
+    started = time.perf_counter()
+    generate_responses(db, LLMResponse, responses, rng, now)
+    _timed(f'{responses} responses', started)
+
+    started = time.perf_counter()
+    generate_sessions(db, EvaluationSession, sessions, rng, now)
+    _timed(f'{sessions} sessions', started)
+
+    response_ids = np.array(db.session.execute(select(LLMResponse.id).order_by(LLMResponse.id)).scalars().all())
+    session_ids = db.session.execute(select(EvaluationSession.id).order_by(EvaluationSession.id)).scalars().all()
+    started = time.perf_counter()
+    written = generate_evaluations(db, Evaluation, evaluations, response_ids, session_ids, rng, now) \
+        if len(response_ids) and session_ids else 0
+    _timed(f'{written} evaluations', started)
+
+    started = time.perf_counter()
+    rebuild_session_stats()
+    enqueue_responses()
+    if search_index:
+        rebuild_search_index()
+    bump_data_version()
+    db.session.commit()
+    _timed('rollups, work queue and search index', started)
+
+    return {'responses': responses, 'sessions': sessions, 'evaluations': written}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'), required=not os.environ.get('DATABASE_URL'),
+                        help='Target database; defaults to DATABASE_URL. Should be empty.')
+    parser.add_argument('--responses', type=int, default=100000)
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--evaluations', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-search-index', action='store_true', help='Skip building the full-text index.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url, 'SQL_INSTRUMENTATION': False})
+    with app.app_context():
+        counts = generate(args.responses, args.sessions, args.evaluations,
+                          seed=args.seed, search_index=not args.no_search_index)
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == '__main__':
+    main()
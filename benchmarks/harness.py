@@ -0,0 +1,253 @@
+"""Drive the main routes through the test client and record latency percentiles.
+
+Each scenario runs in its own interpreter so its peak RSS is its own.
+Every request's SQL statements are counted with an engine listener, which
+also sees the queries of streamed responses. Results are written as a JSON
+baseline and can be compared with an earlier one:
+
+    python -m benchmarks.generate --database-url sqlite:///bench.db
+    python -m benchmarks.harness --database-url sqlite:///bench.db --output before.json
+    # ...change something...
+    python -m benchmarks.harness --database-url sqlite:///bench.db --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (how to pick request paths, whether it belongs to the default run)
+SCENARIOS = {
+    'index': ('static:/', True),
+    'dashboard': ('static:/dashboard', True),
+    'dashboard_completed': ('static:/dashboard?status=completed', True),
+    'session_detail': ('session:/session/{id}', True),
+    'session_stats': ('session:/api/session_stats/{id}', True),
+    'evaluate': ('open_session:/evaluate/{id}', True),
+    'export_session': ('session:/export_session/{id}', True),
+    'export_session_ndjson': ('session:/export_session/{id}?format=ndjson', False),
+    'search': ('static:/api/search?q=fabricated+statistics&kind=evaluations', True),
+    'analytics': ('static:/api/analytics', False),
+}
+DEFAULT_REQUESTS = 200
+WARMUP_REQUESTS = 5
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_p50', 'queries_max', 'peak_rss_mb')
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _paths(kind, template, count, seed):
+    """Request paths for a scenario, cycling through a seeded sample of sessions"""
+    if kind == 'static':
+        return [template] * count
+
+    import random
+    from sqlalchemy import select
+    from app import db
+    from models import EvaluationSession
+    query = select(EvaluationSession.id)
+    if kind == 'open_session':
+        query = query.where(EvaluationSession.status == 'in_progress')
+    session_ids = db.session.execute(query.order_by(EvaluationSession.id)).scalars().all()
+    if not session_ids:
+        raise SystemExit(f'No sessions to request {template}; generate a corpus first')
+    sampler = random.Random(seed)
+    return [template.format(id=sampler.choice(session_ids)) for _ in range(count)]
+
+
+def run_scenario(name, requests, seed, no_cache):
+    """Run one scenario in this process and return its measurements"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import create_app, db
+
+    config = {'SQL_INSTRUMENTATION': False}
+    if no_cache:
+        config['CACHE_MAX_ENTRIES'] = 0
+    app = create_app(config)
+    client = app.test_client()
+
+    statements = [0]
+
+    def count_statement(*args):
+        statements[0] += 1
+
+    event.listen(Engine, 'after_cursor_execute', count_statement)
+
+    spec, _ = SCENARIOS[name]
+    kind, template = spec.split(':', 1)
+    with app.app_context():
+        paths = _paths(kind, template, WARMUP_REQUESTS + requests, seed)
+        db.session.remove()
+
+    latencies = []
+    queries = []
+    statuses = set()
+    for index, path in enumerate(paths):
+        statements[0] = 0
+        started = time.perf_counter()
+        response = client.get(path)
+        b''.join(response.response)  # drain streamed bodies
+        elapsed = time.perf_counter() - started
+        response.close()
+        if index < WARMUP_REQUESTS:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(statements[0])
+        statuses.add(response.status_code)
+
+    if kind == 'open_session':
+        # Hand back the leases the evaluate requests took so runs stay repeatable
+        from assignment import release_leases
+        with app.app_context():
+            for session_id in {int(path.rsplit('/', 1)[1]) for path in paths}:
+                release_leases(session_id)
+            db.session.commit()
+
+    return {
+        'requests': requests,
+        'statuses': sorted(statuses),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'max_ms': round(max(latencies), 2),
+        'queries_p50': percentile(queries, 0.50),
+        'queries_max': max(queries),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _git_commit():
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _corpus(env):
+    """Row counts of the benchmarked database, so baselines are only compared like for like"""
+    code = (
+        "import json\n"
+        "from app import create_app, db\n"
+        "from models import LLMResponse, EvaluationSession, Evaluation\n"
+        "app = create_app({'SQL_INSTRUMENTATION': False})\n"
+        "with app.app_context():\n"
+        "    print(json.dumps({'dialect': db.engine.dialect.name,\n"
+        "                      'responses': LLMResponse.query.count(),\n"
+        "                      'sessions': EvaluationSession.query.count(),\n"
+        "                      'evaluations': Evaluation.query.count()}))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def run(scenarios, requests, seed, no_cache, env):
+    results = {}
+    for name in scenarios:
+        command = [sys.executable, '-m', 'benchmarks.harness', '--worker', name,
+                   '--requests', str(requests), '--seed', str(seed)]
+        if no_cache:
+            command.append('--no-cache')
+        output = subprocess.run(command, cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+        results[name] = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{name:24} p50 {results[name]['p50_ms']:>9.2f}ms  p95 {results[name]['p95_ms']:>9.2f}ms  "
+              f"p99 {results[name]['p99_ms']:>9.2f}ms  queries {results[name]['queries_p50']:>4}  "
+              f"rss {results[name]['peak_rss_mb']:>7.1f}MB", file=sys.stderr)
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """Print metric changes against a baseline; returns the regressions found"""
+    for setting in ('corpus', 'no_cache'):
+        if current[setting] != baseline.get(setting):
+            print(f"Warning: {setting} differs from the baseline ({baseline.get(setting)})", file=sys.stderr)
+
+    regressions = []
+    print(f"{'scenario':24} {'metric':12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        for metric in METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+            flag = ''
+            if change > tolerance:
+                flag = '  REGRESSION'
+                regressions.append((name, metric, old, new))
+            print(f'{name:24} {metric:12} {old:>10} {new:>10} {change:>+8.1%}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                        help='Database to benchmark, e.g. one filled by benchmarks.generate. Defaults to DATABASE_URL.')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Scenario to run (repeatable). Defaults to all routes except the heavy optional ones.')
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help='Measured requests per scenario.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cache', action='store_true', help='Disable the index/dashboard read cache.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='Baseline JSON to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Relative increase reported as a regression (default 0.10).')
+    parser.add_argument('--worker', choices=sorted(SCENARIOS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scenario(args.worker, args.requests, args.seed, args.no_cache)))
+        return
+    if not args.database_url:
+        parser.error('--database-url or DATABASE_URL is required')
+
+    env = dict(os.environ, DATABASE_URL=args.database_url, LOG_LEVEL='ERROR')
+    scenarios = args.scenario or [name for name, (_, default) in SCENARIOS.items() if default]
+    current = {
+        'commit': _git_commit(),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'corpus': _corpus(env),
+        'requests': args.requests,
+        'no_cache': args.no_cache,
+        'scenarios': run(scenarios, args.requests, args.seed, args.no_cache, env),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    else:
+        print(json.dumps(current, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
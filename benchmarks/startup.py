@@ -0,0 +1,77 @@
+"""Measure how quickly a fresh worker process can serve its first request.
+
+Each run starts a new interpreter, imports ``main`` (which calls
+``create_app()``), then issues one request through the test client.
+Example:
+
+    python -m benchmarks.startup --runs 10 --path /dashboard
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = """
+import json, time
+started = time.perf_counter()
+from main import app
+imported = time.perf_counter()
+response = app.test_client().get({path!r})
+served = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - started) * 1000,
+                  'first_request_ms': (served - imported) * 1000,
+                  'ready_ms': (served - started) * 1000,
+                  'status': response.status_code}}))
+"""
+
+
+def _prepare_database(env):
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'init-db'],
+                   cwd=ROOT, env=env, check=True, capture_output=True)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'seed'],
+                   cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def run(runs, path, env):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _CHILD.format(path=path)],
+                                cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    summary = {'runs': runs, 'path': path, 'statuses': sorted({s['status'] for s in samples})}
+    for metric in ('import_ms', 'first_request_ms', 'ready_ms'):
+        values = sorted(s[metric] for s in samples)
+        summary[metric] = {
+            'median': round(statistics.median(values), 2),
+            'min': round(values[0], 2),
+            'max': round(values[-1], 2),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                        help='Defaults to DATABASE_URL, or a throwaway SQLite database.')
+    args = parser.parse_args()
+
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.database_url:
+            env['DATABASE_URL'] = args.database_url
+        else:
+            env['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'startup.db')}"
+            _prepare_database(env)
+        print(json.dumps(run(args.runs, args.path, env), indent=2))
+
+
+if __name__ == '__main__':
+    main()
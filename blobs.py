@@ -0,0 +1,157 @@
+import hashlib
+import zlib
+from flask import current_app
+from sqlalchemy import select, insert, update, bindparam, table, column
+from sqlalchemy.dialects import sqlite, postgresql
+from app import db
+from models import TextBlob
+from cache import LRUCache
+
+LOOKUP_CHUNK = 5000
+ZLIB_LEVEL = 6
+
+
+def text_hash(text):
+    """Content address of a text: sha256 of its UTF-8 bytes"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError('zstd-compressed text needs the zstandard package') from None
+    return zstandard
+
+
+def compress(data, codec):
+    """(codec, payload) for UTF-8 bytes; 'raw' when compression would not shrink them"""
+    if codec == 'zstd':
+        payload = _zstd().ZstdCompressor().compress(data)
+    else:
+        codec, payload = 'zlib', zlib.compress(data, ZLIB_LEVEL)
+    if len(payload) >= len(data):
+        return 'raw', data
+    return codec, payload
+
+
+def decompress(codec, payload):
+    if codec == 'zlib':
+        return zlib.decompress(payload)
+    if codec == 'zstd':
+        return _zstd().ZstdDecompressor().decompress(payload)
+    return payload
+
+
+def get_text_cache():
+    """This worker's LRU of decompressed texts by hash, created from config on first use"""
+    cache = current_app.extensions.get('text_cache')
+    if cache is None:
+        # Blobs never change, so entries only leave the cache when it is full
+        cache = LRUCache(max_entries=current_app.config['BLOB_CACHE_ENTRIES'], ttl=None,
+                         max_bytes=current_app.config['BLOB_CACHE_BYTES'])
+        current_app.extensions['text_cache'] = cache
+    return cache
+
+
+def store_texts(texts):
+    """Store texts as compressed blobs and return their hashes, in order.
+
+    Texts already stored (by this or any earlier batch) are not written
+    again. Runs in the caller's transaction.
+    """
+    hashes = [text_hash(text) for text in texts]
+    pending = dict(zip(hashes, texts))
+    pending_hashes = list(pending)
+    for start in range(0, len(pending_hashes), LOOKUP_CHUNK):
+        chunk = pending_hashes[start:start + LOOKUP_CHUNK]
+        for stored in db.session.execute(select(TextBlob.hash).where(TextBlob.hash.in_(chunk))).scalars():
+            del pending[stored]
+    if not pending:
+        return hashes
+
+    codec = current_app.config['BLOB_COMPRESSION']
+    rows = []
+    for content_hash, text in pending.items():
+        data = text.encode('utf-8')
+        row_codec, payload = compress(data, codec)
+        rows.append({'hash': content_hash, 'codec': row_codec, 'size': len(data), 'data': payload})
+
+    # A concurrent ingest may store the same text between the lookup and the insert
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        statement = sqlite.insert(TextBlob).on_conflict_do_nothing(index_elements=['hash'])
+    elif dialect == 'postgresql':
+        statement = postgresql.insert(TextBlob).on_conflict_do_nothing(index_elements=['hash'])
+    else:
+        statement = insert(TextBlob)
+    db.session.execute(statement, rows)
+    return hashes
+
+
+def load_texts(hashes, cache=True):
+    """Texts for the given hashes as {hash: text}.
+
+    Hits come from the worker's LRU; misses are fetched with chunked IN
+    lookups and decompressed once. Bulk readers that touch each text once
+    (exports, index rebuilds) pass cache=False so they do not evict the
+    texts the pages keep reusing.
+    """
+    text_cache = get_text_cache() if cache else None
+    texts = {}
+    missing = []
+    for content_hash in set(hashes):
+        text = text_cache.get(content_hash) if text_cache is not None else None
+        if text is None:
+            missing.append(content_hash)
+        else:
+            texts[content_hash] = text
+    for start in range(0, len(missing), LOOKUP_CHUNK):
+        chunk = missing[start:start + LOOKUP_CHUNK]
+        for content_hash, codec, payload in db.session.execute(
+            select(TextBlob.hash, TextBlob.codec, TextBlob.data).where(TextBlob.hash.in_(chunk))
+        ):
+            text = decompress(codec, payload).decode('utf-8')
+            texts[content_hash] = text
+            if text_cache is not None:
+                text_cache.set(content_hash, text)
+    return texts
+
+
+def load_text(content_hash):
+    return load_texts([content_hash])[content_hash]
+
+
+def prefetch_texts(responses):
+    """Load the prompt and response text of many LLMResponse objects in one lookup"""
+    load_texts([h for response in responses for h in (response.prompt_hash, response.response_hash)])
+
+
+def move_legacy_text(batch_size=LOOKUP_CHUNK):
+    """Move text from the old llm_response.prompt/response columns into blobs.
+
+    For databases created before text_blob existed, once the prompt_hash
+    and response_hash columns have been added. Fills the hashes of rows
+    that have none, a batch per commit. Returns the number of rows moved.
+    """
+    legacy = table('llm_response', column('id'), column('prompt'), column('response'),
+                   column('prompt_hash'), column('response_hash'))
+    moved = 0
+    while True:
+        rows = db.session.execute(
+            select(legacy.c.id, legacy.c.prompt, legacy.c.response)
+            .where(legacy.c.prompt_hash.is_(None))
+            .order_by(legacy.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return moved
+        hashes = store_texts([row.prompt for row in rows] + [row.response for row in rows])
+        db.session.execute(
+            update(legacy).where(legacy.c.id == bindparam('row_id'))
+            .values(prompt_hash=bindparam('new_prompt_hash'), response_hash=bindparam('new_response_hash')),
+            [{'row_id': row.id, 'new_prompt_hash': prompt_hash, 'new_response_hash': response_hash}
+             for row, prompt_hash, response_hash in zip(rows, hashes, hashes[len(rows):])]
+        )
+        db.session.commit()
+        moved += len(rows)
@@ -0,0 +1,246 @@
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from flask import current_app, g, request, session, make_response
+from sqlalchemy import update
+from app import db
+from models import DataVersion
+
+DATA_VERSION_ID = 1
+SWEEP_SECONDS = 60
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache whose entries expire after ``ttl`` seconds (never if None).
+
+    Holds at most ``max_entries`` entries and, when ``max_bytes`` is set,
+    at most that many bytes of values as measured by ``sys.getsizeof``.
+    """
+
+    def __init__(self, max_entries=256, ttl=300, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value, size = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = sys.getsizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return  # would only push everything else out
+            self._entries[key] = (time.monotonic() + self.ttl if self.ttl is not None else None, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class FileCache:
+    """Pickle-per-key cache in a local directory, shared by all workers on a host.
+
+    Each process sweeps the directory at most every SWEEP_SECONDS when it
+    writes: expired files and files written before the last data change
+    are deleted, then the oldest files until at most ``max_entries`` remain.
+    """
+
+    def __init__(self, directory, ttl=300, max_entries=256):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._next_sweep = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.pickle')
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl < time.time():
+                os.remove(path)
+                return default
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except (OSError, EOFError, pickle.PickleError):
+            return default
+        return value if stored_key == key else default
+
+    def set(self, key, value):
+        # Write to a temp file and rename so readers never see partial pickles
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logging.warning(f"Could not write cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def maybe_sweep(self, stale_before=0):
+        """Sweep unless this process did so in the last SWEEP_SECONDS"""
+        with self._lock:
+            now = time.time()
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + SWEEP_SECONDS
+        self.sweep(stale_before)
+
+    def sweep(self, stale_before=0):
+        """Delete expired entries, entries written before ``stale_before`` (a
+        Unix time) and abandoned temp files, then the oldest entries over
+        max_entries. Returns the number of files deleted."""
+        expired_before = max(time.time() - self.ttl, stale_before)
+        kept, doomed = [], []
+        for entry in os.scandir(self.directory):
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            if entry.name.endswith('.pickle'):
+                (doomed if mtime < expired_before else kept).append((mtime, entry.path))
+            elif entry.name.endswith('.tmp') and mtime < time.time() - self.ttl:
+                doomed.append((mtime, entry.path))
+        if len(kept) > self.max_entries:
+            kept.sort()
+            doomed.extend(kept[:len(kept) - self.max_entries])
+
+        deleted = 0
+        for _, path in doomed:
+            try:
+                os.remove(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass  # another worker swept it first
+        return deleted
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.pickle'):
+                os.remove(os.path.join(self.directory, name))
+
+
+def get_cache():
+    """The app's cache backend, created from config on first use"""
+    cache = current_app.extensions.get('data_cache')
+    if cache is None:
+        config = current_app.config
+        if config['CACHE_BACKEND'] == 'filesystem':
+            cache = FileCache(config['CACHE_DIR'], ttl=config['CACHE_TTL_SECONDS'],
+                              max_entries=config['CACHE_MAX_ENTRIES'])
+        else:
+            cache = LRUCache(max_entries=config['CACHE_MAX_ENTRIES'], ttl=config['CACHE_TTL_SECONDS'])
+        current_app.extensions['data_cache'] = cache
+    return cache
+
+
+def bump_data_version():
+    """Invalidate every cached read. Runs in the caller's transaction."""
+    result = db.session.execute(
+        update(DataVersion)
+        .where(DataVersion.id == DATA_VERSION_ID)
+        .values(version=DataVersion.version + 1, changed_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        db.session.add(DataVersion(id=DATA_VERSION_ID, version=1, changed_at=datetime.utcnow()))
+
+
+def current_data_version():
+    """(version, changed_at) of the data, read once per request"""
+    if 'data_version' not in g:
+        row = db.session.get(DataVersion, DATA_VERSION_ID)
+        g.data_version = (row.version, row.changed_at) if row else (0, datetime(1970, 1, 1))
+    return g.data_version
+
+
+def cached(name, compute, *args):
+    """Return compute(*args), reusing the result until the data version changes"""
+    version, changed_at = current_data_version()
+    key = (name, version, args)
+    cache = get_cache()
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute(*args)
+        cache.set(key, value)
+        if isinstance(cache, FileCache):
+            # Files written before the last change hold earlier versions nobody reads again
+            cache.maybe_sweep(changed_at.replace(tzinfo=timezone.utc).timestamp())
+    return value
+
+
+def _etag(version):
+    # Pages differ by query string (filters, cursors), so it is part of the tag
+    return hashlib.sha1(f'{version}:{request.full_path}'.encode('utf-8')).hexdigest()
+
+
+def _is_fresh(etag, changed_at):
+    # The ETag names the data version, so when it is sent it alone decides
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return request.if_modified_since.replace(tzinfo=None) >= changed_at.replace(microsecond=0)
+    return False
+
+
+def _last_modified_settled(changed_at):
+    # Last-Modified has one-second resolution: a copy served in the same second
+    # as the change could not be told apart from one made before a second change
+    # in that second, and would get a stale 304 from If-Modified-Since
+    return datetime.utcnow() >= changed_at.replace(microsecond=0) + timedelta(seconds=1)
+
+
+def conditional_page(render):
+    """Serve a page with ETag/Last-Modified validators tied to the data version.
+
+    Answers 304 without calling ``render`` when the client's copy is
+    current. Last-Modified is only sent once the change is a second old.
+    Pages with a pending flash message are always rendered and
+    never given validators, since the message is part of the markup.
+    """
+    if session.get('_flashes'):
+        response = make_response(render())
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    version, changed_at = current_data_version()
+    etag = _etag(version)
+    response = make_response('', 304) if _is_fresh(etag, changed_at) else make_response(render())
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(etag)
+    if _last_modified_settled(changed_at):
+        response.last_modified = changed_at
+    return response
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, tuple_
+from app import db
+from models import EvaluationSession, Evaluation, LLMResponse
+from exports import evaluation_record, session_record, texts_for, EVALUATION_COLUMNS, RESPONSE_COLUMNS
+
+DEFAULT_CHANGE_LIMIT = 500
+MAX_CHANGE_LIMIT = 5000
+
+
+def _encode_position(timestamp, row_id):
+    return f'{timestamp.isoformat()}_{row_id}'
+
+
+def _decode_position(position):
+    if not position:
+        return None
+    created_at, row_id = position.rsplit('_', 1)
+    return datetime.fromisoformat(created_at), int(row_id)
+
+
+def encode_cursor(evaluation_position, session_position):
+    """Opaque cursor holding the last evaluation and the last session completion delivered"""
+    return '~'.join(_encode_position(*p) if p else '' for p in (evaluation_position, session_position))
+
+
+def decode_cursor(cursor):
+    """Parse a cursor produced by encode_cursor into (evaluation, session) positions, or None if malformed"""
+    try:
+        evaluation_position, session_position = cursor.split('~')
+        return _decode_position(evaluation_position), _decode_position(session_position)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _after(columns, position, settled_before):
+    conditions = [columns[0] < settled_before]
+    if position:
+        conditions.append(tuple_(*columns) > tuple_(*position))
+    return conditions
+
+
+def change_page(cursor=None, limit=DEFAULT_CHANGE_LIMIT):
+    """Evaluations and session completions recorded after ``cursor``, oldest first.
+
+    Evaluations are read in (created_at, id) order and session completions
+    in (completed_at, id) order, each as an index range scan from its
+    position in the cursor. Rows younger than CHANGES_SETTLE_SECONDS are
+    held back, so a transaction that commits a little after its
+    timestamps were taken is not skipped. The returned cursor is always
+    set; pass it back to resume. has_more is True when another page is
+    ready now.
+    """
+    limit = max(1, min(limit, MAX_CHANGE_LIMIT))
+    evaluation_position, session_position = decode_cursor(cursor) if cursor else (None, None)
+    settled_before = datetime.utcnow() - timedelta(seconds=current_app.config['CHANGES_SETTLE_SECONDS'])
+
+    evaluation_rows = db.session.execute(
+        select(*EVALUATION_COLUMNS, *RESPONSE_COLUMNS, Evaluation.response_id,
+               EvaluationSession.status.label('session_status'))
+        .join(LLMResponse, LLMResponse.id == Evaluation.response_id)
+        .join(EvaluationSession, EvaluationSession.id == Evaluation.session_id)
+        .where(*_after((Evaluation.created_at, Evaluation.id), evaluation_position, settled_before))
+        .order_by(Evaluation.created_at, Evaluation.id)
+        .limit(limit + 1)
+    ).all()
+
+    sessions = db.session.execute(
+        select(EvaluationSession)
+        .where(*_after((EvaluationSession.completed_at, EvaluationSession.id), session_position, settled_before))
+        .order_by(EvaluationSession.completed_at, EvaluationSession.id)
+        .limit(limit + 1)
+    ).scalars().all()
+
+    has_more = len(evaluation_rows) > limit or len(sessions) > limit
+    evaluation_rows = evaluation_rows[:limit]
+    sessions = sessions[:limit]
+    if evaluation_rows:
+        evaluation_position = (evaluation_rows[-1].created_at, evaluation_rows[-1].id)
+    if sessions:
+        session_position = (sessions[-1].completed_at, sessions[-1].id)
+
+    texts = texts_for(evaluation_rows, cache=False)
+    evaluations = []
+    for row in evaluation_rows:
+        record = evaluation_record(row, texts)
+        record.update(session_id=row.session_id, session_status=row.session_status,
+                      response_id=row.response_id)
+        evaluations.append(record)
+
+    return {
+        'evaluations': evaluations,
+        'completed_sessions': [session_record(session) for session in sessions],
+        'cursor': encode_cursor(evaluation_position, session_position),
+        'has_more': has_more,
+    }
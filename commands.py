@@ -0,0 +1,140 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+from assignment import enqueue_responses
+from rollups import rebuild_session_stats, backfill_session_stats
+from ingest import ingest_jsonl, backfill_content_hashes, DEFAULT_BATCH_SIZE
+from search import rebuild_search_index
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create any missing database tables and rollups"""
+    db.create_all()
+    click.echo('Database tables created')
+    written = backfill_session_stats()
+    db.session.commit()
+    if written:
+        click.echo(f'Wrote rollups for {written} sessions that had none')
+
+
+@click.command('seed')
+@with_appcontext
+def seed_command():
+    """Load the sample LLM responses into an empty database"""
+    from sample_data import initialize_sample_data
+    initialize_sample_data()
+
+
+@click.command('rebuild-session-stats')
+@click.option('--session-id', 'session_ids', type=int, multiple=True,
+              help='Only rebuild these sessions (repeatable). Defaults to all sessions.')
+@with_appcontext
+def rebuild_session_stats_command(session_ids):
+    """Backfill or repair the per-session rating rollups"""
+    written = rebuild_session_stats(list(session_ids) or None)
+    db.session.commit()
+    click.echo(f'Rebuilt rollups for {written} sessions')
+
+
+@click.command('ingest-responses')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True,
+              help='Rows per insert batch and commit.')
+@click.option('--prompt-field', default='prompt', show_default=True)
+@click.option('--response-field', default='response', show_default=True)
+@click.option('--model-field', default='model_name', show_default=True)
+@with_appcontext
+def ingest_responses_command(path, batch_size, prompt_field, response_field, model_field):
+    """Bulk-load LLM responses from a JSONL file"""
+    with open(path, 'rb') as stream:
+        report = ingest_jsonl(stream, batch_size=batch_size, prompt_field=prompt_field,
+                              response_field=response_field, model_field=model_field)
+    click.echo(f"Read {report['read']} records: {report['inserted']} inserted, "
+               f"{report['duplicates']} duplicates, {report['invalid']} invalid "
+               f"in {report['seconds']}s ({report['rows_per_sec']} rows/sec)")
+
+
+@click.command('backfill-content-hash')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Responses hashed per batch and commit.')
+@with_appcontext
+def backfill_content_hash_command(batch_size):
+    """Give responses stored before ingest deduplication their content hash"""
+    hashed, duplicates = backfill_content_hashes(batch_size=batch_size)
+    click.echo(f'Hashed {hashed} responses; {duplicates} duplicate an already hashed response and were left unhashed')
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the response and evaluation tables"""
+    responses, evaluations = rebuild_search_index()
+    db.session.commit()
+    click.echo(f'Indexed {responses} responses and {evaluations} evaluations')
+
+
+@click.command('dedupe-responses')
+@click.option('--batch-size', default=5000, show_default=True, help='Responses signed per batch and commit.')
+@with_appcontext
+def dedupe_responses_command(batch_size):
+    """Cluster near-duplicate responses that were stored before signatures existed"""
+    from minhash import dedupe_existing
+    signed, duplicates, retired = dedupe_existing(batch_size=batch_size)
+    click.echo(f'Signed {signed} responses: {duplicates} near-duplicates found, '
+               f'{retired} queued work items retired')
+
+
+@click.command('move-response-text')
+@click.option('--batch-size', default=5000, show_default=True, help='Responses moved per batch and commit.')
+@with_appcontext
+def move_response_text_command(batch_size):
+    """Move prompt and response text from the old llm_response columns into compressed blobs"""
+    from blobs import move_legacy_text
+    moved = move_legacy_text(batch_size=batch_size)
+    click.echo(f'Moved the text of {moved} responses')
+
+
+@click.command('enqueue-responses')
+@with_appcontext
+def enqueue_responses_command():
+    """Top up the work queue so every response reaches its rating target"""
+    added = enqueue_responses()
+    db.session.commit()
+    click.echo(f'Queued {added} work items')
+
+
+@click.command('snapshot-ratings')
+@click.option('--dir', 'directory', default=None,
+              help='Snapshot directory. Defaults to the SNAPSHOT_DIR setting.')
+@click.option('--full', is_flag=True, help='Rewrite the snapshot instead of appending new rows.')
+@with_appcontext
+def snapshot_ratings_command(directory, full):
+    """Write or refresh the columnar ratings snapshot"""
+    from snapshot import write_snapshot
+    directory = directory or current_app.config['SNAPSHOT_DIR']
+    manifest = write_snapshot(directory, full=full)
+    click.echo(f"Snapshot in {directory} holds {manifest['rows']} ratings "
+               f"(through evaluation {manifest['last_evaluation_id']})")
+
+
+@click.command('run-jobs')
+@click.option('--workers', type=int, default=None,
+              help='Jobs run at once. Defaults to JOB_WORKERS, or 2 when that is 0.')
+@with_appcontext
+def run_jobs_command(workers):
+    """Run queued background jobs in the foreground until interrupted"""
+    from jobs import JobRunner
+    workers = workers or current_app.config['JOB_WORKERS'] or 2
+    runner = JobRunner(current_app._get_current_object(), workers)
+    click.echo(f'Running jobs with {workers} workers as {runner.name}')
+    runner.run_forever()
+
+
+def register_commands(app):
+    for command in (init_db_command, seed_command, rebuild_session_stats_command,
+                    ingest_responses_command, enqueue_responses_command, snapshot_ratings_command,
+                    rebuild_search_index_command, dedupe_responses_command, run_jobs_command,
+                    move_response_text_command, backfill_content_hash_command):
+        app.cli.add_command(command)
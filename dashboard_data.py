@@ -0,0 +1,111 @@
+from datetime import datetime
+from sqlalchemy import func, case, cast, Float, tuple_
+from app import db
+from models import EvaluationSession, Evaluation
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+SESSION_STATUSES = ('in_progress', 'completed')
+
+RATING_CRITERIA = ['helpfulness', 'correctness', 'coherence', 'empathy_tone', 'safety']
+
+
+def _average_rating_expr():
+    """SQL equivalent of Evaluation.average_rating for a single row"""
+    columns = [getattr(Evaluation, name) for name in RATING_CRITERIA]
+    total = sum(func.coalesce(column, 0) for column in columns)
+    rated = sum(case((column.isnot(None), 1), else_=0) for column in columns)
+    return func.coalesce(cast(total, Float) / func.nullif(rated, 0), 0)
+
+
+def encode_cursor(session):
+    """Build an opaque keyset cursor from the last session on a page"""
+    return f"{session.created_at.isoformat()}_{session.id}"
+
+
+def decode_cursor(cursor):
+    """Parse a cursor produced by encode_cursor, returning None if malformed"""
+    try:
+        created_at, session_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(session_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def session_dict(session):
+    """Plain, cacheable view of the session fields the listings show"""
+    return {
+        'id': session.id,
+        'evaluator_name': session.evaluator_name,
+        'created_at': session.created_at,
+        'status': session.status,
+    }
+
+
+def session_aggregates(session_ids):
+    """Per-session evaluation count, mean rating and high-risk count in one grouped query"""
+    if not session_ids:
+        return {}
+
+    rows = db.session.query(
+        Evaluation.session_id,
+        func.count(Evaluation.id),
+        func.avg(_average_rating_expr()),
+        func.sum(case((Evaluation.safety <= 2, 1), else_=0)),
+    ).filter(Evaluation.session_id.in_(session_ids)).group_by(Evaluation.session_id).all()
+
+    return {
+        session_id: {
+            'evaluation_count': count,
+            'avg_rating': float(avg_rating or 0),
+            'high_risk_count': int(high_risk or 0),
+        }
+        for session_id, count, avg_rating, high_risk in rows
+    }
+
+
+def session_page(status=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one keyset-paginated page of sessions with their aggregates.
+
+    Sessions are ordered newest first by (created_at, id). The returned
+    next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = EvaluationSession.query
+
+    if status in SESSION_STATUSES:
+        query = query.filter(EvaluationSession.status == status)
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        query = query.filter(
+            tuple_(EvaluationSession.created_at, EvaluationSession.id) < tuple_(*position)
+        )
+
+    sessions = query.order_by(EvaluationSession.created_at.desc(),
+                              EvaluationSession.id.desc()).limit(limit + 1).all()
+    has_more = len(sessions) > limit
+    sessions = sessions[:limit]
+
+    aggregates = session_aggregates([s.id for s in sessions])
+    empty = {'evaluation_count': 0, 'avg_rating': 0.0, 'high_risk_count': 0}
+    rows = [dict(aggregates.get(s.id, empty), session=session_dict(s)) for s in sessions]
+
+    return {
+        'rows': rows,
+        'next_cursor': encode_cursor(sessions[-1]) if has_more else None,
+    }
+
+
+def dashboard_totals():
+    """Session counts by status and the overall evaluation count"""
+    by_status = dict(
+        db.session.query(EvaluationSession.status, func.count(EvaluationSession.id))
+        .group_by(EvaluationSession.status).all()
+    )
+    return {
+        'total_sessions': sum(by_status.values()),
+        'completed': by_status.get('completed', 0),
+        'in_progress': by_status.get('in_progress', 0),
+        'total_evaluations': db.session.query(func.count(Evaluation.id)).scalar(),
+    }
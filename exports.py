@@ -0,0 +1,110 @@
+import json
+from textwrap import indent
+from sqlalchemy import select
+from app import db
+from models import Evaluation, LLMResponse
+from blobs import load_texts
+
+EXPORT_BATCH_SIZE = 500
+EXPORT_FORMATS = ('json', 'ndjson')
+
+EVALUATION_COLUMNS = [
+    Evaluation.id, Evaluation.session_id, Evaluation.created_at,
+    Evaluation.helpfulness, Evaluation.correctness, Evaluation.coherence,
+    Evaluation.empathy_tone, Evaluation.safety, Evaluation.overall_rating,
+    Evaluation.evaluator_notes, Evaluation.improvement_suggestions,
+    Evaluation.safety_concerns, Evaluation.hallucination_flags,
+    Evaluation.requires_revision,
+]
+RESPONSE_COLUMNS = [LLMResponse.prompt_hash, LLMResponse.response_hash, LLMResponse.model_name]
+
+
+def session_record(session):
+    """Export representation of an EvaluationSession"""
+    return {
+        'id': session.id,
+        'evaluator_name': session.evaluator_name,
+        'created_at': session.created_at.isoformat(),
+        'completed_at': session.completed_at.isoformat() if session.completed_at else None,
+        'status': session.status
+    }
+
+
+def evaluation_record(row, texts):
+    """Export representation of one joined evaluation + response row.
+
+    ``texts`` maps the row's prompt and response hashes to their text.
+    """
+    return {
+        'id': row.id,
+        'response': {
+            'prompt': texts[row.prompt_hash],
+            'response': texts[row.response_hash],
+            'model_name': row.model_name
+        },
+        'ratings': {
+            'helpfulness': row.helpfulness,
+            'correctness': row.correctness,
+            'coherence': row.coherence,
+            'empathy_tone': row.empathy_tone,
+            'safety': row.safety,
+            'overall_rating': row.overall_rating
+        },
+        'feedback': {
+            'evaluator_notes': row.evaluator_notes,
+            'improvement_suggestions': row.improvement_suggestions,
+            'safety_concerns': row.safety_concerns,
+            'hallucination_flags': row.hallucination_flags,
+            'requires_revision': row.requires_revision
+        },
+        'metrics': {
+            'average_rating': Evaluation.average_of([row.helpfulness, row.correctness, row.coherence,
+                                                     row.empathy_tone, row.safety]),
+            'risk_level': Evaluation.risk_level_for(row.safety)
+        },
+        'created_at': row.created_at.isoformat()
+    }
+
+
+def texts_for(rows, cache=True):
+    """Prompt and response text of joined rows, as {hash: text}"""
+    return load_texts([h for row in rows for h in (row.prompt_hash, row.response_hash)], cache=cache)
+
+
+def iter_evaluation_rows(session_id, batch_size=EXPORT_BATCH_SIZE):
+    """Stream a session's evaluations joined to their responses in batches.
+
+    Selects plain columns rather than ORM entities, so rows are not kept in
+    the identity map and memory stays bounded by the batch size. Yields
+    (row, texts) pairs; the texts of each batch are fetched in one lookup
+    and bypass the text cache, since an export reads each one once.
+    """
+    query = select(*EVALUATION_COLUMNS, *RESPONSE_COLUMNS) \
+        .join(LLMResponse, LLMResponse.id == Evaluation.response_id) \
+        .where(Evaluation.session_id == session_id) \
+        .order_by(Evaluation.id) \
+        .execution_options(yield_per=batch_size)
+    for batch in db.session.execute(query).partitions():
+        texts = texts_for(batch, cache=False)
+        for row in batch:
+            yield row, texts
+
+
+def iter_json(session):
+    """Yield a session export as one JSON document, a record at a time"""
+    yield '{\n  "session": '
+    yield indent(json.dumps(session_record(session), indent=2), '  ').lstrip()
+    yield ',\n  "evaluations": ['
+    separator = '\n'
+    for row, texts in iter_evaluation_rows(session.id):
+        yield separator + indent(json.dumps(evaluation_record(row, texts), indent=2), '    ')
+        separator = ',\n'
+    yield '\n  ]\n}\n'
+
+
+def iter_ndjson(session):
+    """Yield a session export as newline-delimited JSON, one evaluation per line"""
+    for row, texts in iter_evaluation_rows(session.id):
+        record = evaluation_record(row, texts)
+        record['session_id'] = session.id
+        yield json.dumps(record) + '\n'
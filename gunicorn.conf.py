@@ -0,0 +1,20 @@
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+
+# Import the app once in the master and fork ready-to-serve workers.
+# Set GUNICORN_PRELOAD=0 to load it in each worker instead (needed for --reload).
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+
+def post_fork(server, worker):
+    """Drop connections inherited from the master so workers never share sockets"""
+    if not preload_app:
+        return
+    from app import db
+    from main import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
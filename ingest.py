@@ -0,0 +1,217 @@
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from sqlalchemy import select, insert, update, bindparam, text
+from sqlalchemy.dialects import sqlite
+from app import db
+from models import LLMResponse
+from assignment import enqueue_responses
+from search import index_responses
+from blobs import store_texts, load_texts
+
+DEFAULT_BATCH_SIZE = 5000
+
+_INSERT_COLUMNS = ['prompt_hash', 'response_hash', 'model_name', 'content_hash', 'created_at']
+
+
+def iter_jsonl(stream, report=None):
+    """Parse a JSONL byte or text stream one line at a time.
+
+    Blank lines are ignored; malformed lines are logged and counted in
+    ``report['invalid']`` instead of aborting the whole file.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+        except ValueError as e:  # includes UnicodeDecodeError
+            logging.warning(f"Skipping malformed JSONL line {line_number}: {e}")
+            if report is not None:
+                report['invalid'] += 1
+            continue
+        yield record
+
+
+def _to_row(record, prompt_field, response_field, model_field, now):
+    if not isinstance(record, dict):
+        return None
+    prompt = record.get(prompt_field)
+    response = record.get(response_field)
+    if not isinstance(prompt, str) or not isinstance(response, str) or not prompt or not response:
+        return None
+    model_name = record.get(model_field)
+    model_name = str(model_name)[:100] if model_name is not None else None
+    return {
+        'prompt': prompt,
+        'response': response,
+        'model_name': model_name,
+        'content_hash': LLMResponse.compute_hash(prompt, response, model_name),
+        'created_at': now,
+    }
+
+
+def _existing_hashes(hashes):
+    query = select(LLMResponse.content_hash).where(LLMResponse.content_hash.in_(hashes))
+    return set(db.session.execute(query).scalars())
+
+
+def _insert_batch(rows):
+    """Insert a batch with executemany, ignoring rows that raced in meanwhile"""
+    rows = [{column: row[column] for column in _INSERT_COLUMNS} for row in rows]
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        _copy_batch(rows)
+        return
+    if dialect == 'sqlite':
+        statement = sqlite.insert(LLMResponse).on_conflict_do_nothing(index_elements=['content_hash'])
+    else:
+        statement = insert(LLMResponse)
+    db.session.execute(statement, rows)
+
+
+def _copy_batch(rows):
+    """Load a batch on PostgreSQL through COPY into a staging table"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row['prompt_hash'], row['response_hash'], row['model_name'],
+                         row['content_hash'], row['created_at'].isoformat()])
+    buffer.seek(0)
+
+    columns = ', '.join(_INSERT_COLUMNS)
+    db.session.execute(text(
+        "CREATE TEMP TABLE IF NOT EXISTS llm_response_staging "
+        "(LIKE llm_response INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    ))
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY llm_response_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    db.session.execute(text(
+        f"INSERT INTO llm_response ({columns}) SELECT {columns} FROM llm_response_staging "
+        "ON CONFLICT (content_hash) DO NOTHING"
+    ))
+
+
+def _flush(rows, report):
+    by_hash = {}
+    for row in rows:
+        by_hash.setdefault(row['content_hash'], row)
+    existing = _existing_hashes(list(by_hash))
+    new_rows = [row for content_hash, row in by_hash.items() if content_hash not in existing]
+
+    if new_rows:
+        # Prompts repeat across models and re-ingested dumps; each text is stored once
+        hashes = store_texts([row['prompt'] for row in new_rows] + [row['response'] for row in new_rows])
+        for row, prompt_hash, response_hash in zip(new_rows, hashes, hashes[len(new_rows):]):
+            row['prompt_hash'], row['response_hash'] = prompt_hash, response_hash
+        _insert_batch(new_rows)
+        new_ids = dict(db.session.execute(
+            select(LLMResponse.content_hash, LLMResponse.id)
+            .where(LLMResponse.content_hash.in_([row['content_hash'] for row in new_rows]))
+        ).tuples().all())
+        stored = [dict(row, id=new_ids[row['content_hash']]) for row in new_rows
+                  if row['content_hash'] in new_ids]
+        # Imported here so workers do not pay for NumPy until something is ingested
+        from minhash import assign_clusters
+        # Near-duplicates share their representative's ratings, so only representatives are queued
+        enqueue_responses(assign_clusters(stored))
+        index_responses(stored)
+    db.session.commit()
+
+    report['inserted'] += len(new_rows)
+    report['duplicates'] += len(rows) - len(new_rows)
+
+
+def ingest_records(records, batch_size=DEFAULT_BATCH_SIZE, prompt_field='prompt',
+                   response_field='response', model_field='model_name', report=None):
+    """Bulk-load prompt/response records, deduplicating by content hash.
+
+    Records are consumed lazily and written in batches of ``batch_size``,
+    each committed on its own, so memory stays bounded by one batch.
+    Returns a report with counts and throughput.
+    """
+    if report is None:
+        report = {'read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0}
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    batch = []
+
+    try:
+        for record in records:
+            report['read'] += 1
+            row = _to_row(record, prompt_field, response_field, model_field, now)
+            if row is None:
+                report['invalid'] += 1
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _flush(batch, report)
+                batch = []
+        if batch:
+            _flush(batch, report)
+    except Exception:
+        db.session.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_sec'] = round(report['read'] / elapsed, 1) if elapsed else None
+    logging.info(f"Ingested {report['inserted']} responses ({report['duplicates']} duplicates, "
+                 f"{report['invalid']} invalid) at {report['rows_per_sec']} rows/sec")
+    return report
+
+
+def ingest_jsonl(stream, **options):
+    """Stream-parse a JSONL file and bulk-load it; see ingest_records"""
+    report = {'read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0}
+    return ingest_records(iter_jsonl(stream, report), report=report, **options)
+
+
+def backfill_content_hashes(batch_size=DEFAULT_BATCH_SIZE):
+    """Fill content_hash for responses stored before ingest deduplicated by it.
+
+    Without it, re-ingesting those responses would store them again.
+    Rows whose content matches a response that already has the hash are
+    left without one and counted as duplicates. Commits after each batch.
+    Returns (hashed, duplicates).
+    """
+    hashed = duplicates = 0
+    last_id = 0
+    table = LLMResponse.__table__
+    while True:
+        rows = db.session.execute(
+            select(LLMResponse.id, LLMResponse.prompt_hash, LLMResponse.response_hash, LLMResponse.model_name)
+            .where(LLMResponse.content_hash.is_(None), LLMResponse.id > last_id)
+            .order_by(LLMResponse.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return hashed, duplicates
+        last_id = rows[-1].id
+
+        texts = load_texts([h for row in rows for h in (row.prompt_hash, row.response_hash)], cache=False)
+        by_hash = {}
+        for row in rows:
+            content_hash = LLMResponse.compute_hash(texts[row.prompt_hash], texts[row.response_hash],
+                                                    row.model_name)
+            by_hash.setdefault(content_hash, row.id)
+        existing = _existing_hashes(list(by_hash))
+        values = [{'row_id': row_id, 'new_hash': content_hash}
+                  for content_hash, row_id in by_hash.items() if content_hash not in existing]
+        if values:
+            db.session.execute(
+                update(table).where(table.c.id == bindparam('row_id')).values(content_hash=bindparam('new_hash')),
+                values
+            )
+        db.session.commit()
+        hashed += len(values)
+        duplicates += len(rows) - len(values)
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import current_app, g, has_request_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOWEST_KEPT = 5
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_listening = False
+
+
+class RequestTracker:
+    """SQL activity recorded while serving one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+        self.slowest = []  # (seconds, statement), longest first
+
+    def record(self, statement, seconds):
+        self.query_count += 1
+        self.db_seconds += seconds
+        self.statements[statement] += 1
+        if len(self.slowest) < SLOWEST_KEPT or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+    def repeated_statements(self, threshold):
+        """Statements issued at least ``threshold`` times: likely N+1 lazy loads"""
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count >= threshold]
+
+
+class MetricsRegistry:
+    """Per-endpoint counters for this worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(lambda: Counter())
+
+    def observe(self, endpoint, tracker, request_seconds, n_plus_one, slow_queries):
+        with self._lock:
+            counters = self._endpoints[endpoint]
+            counters['requests'] += 1
+            counters['request_seconds'] += request_seconds
+            counters['db_queries'] += tracker.query_count
+            counters['db_seconds'] += tracker.db_seconds
+            counters['n_plus_one'] += n_plus_one
+            counters['slow_queries'] += slow_queries
+
+    def render(self):
+        """Prometheus text exposition of the collected counters"""
+        metrics = [
+            ('requests', 'llm_feedback_requests_total', 'counter', 'Requests served'),
+            ('request_seconds', 'llm_feedback_request_seconds_total', 'counter', 'Time spent serving requests'),
+            ('db_queries', 'llm_feedback_db_queries_total', 'counter', 'SQL statements executed'),
+            ('db_seconds', 'llm_feedback_db_seconds_total', 'counter', 'Time spent executing SQL'),
+            ('n_plus_one', 'llm_feedback_n_plus_one_total', 'counter', 'Requests with repeated identical statements'),
+            ('slow_queries', 'llm_feedback_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_MS'),
+        ]
+        with self._lock:
+            snapshot = {endpoint: dict(counters) for endpoint, counters in self._endpoints.items()}
+
+        lines = []
+        for key, name, kind, description in metrics:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for endpoint in sorted(snapshot):
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {snapshot[endpoint].get(key, 0)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def current_tracker():
+    """The SQL tracker for the active request, or None outside a request"""
+    if has_request_context():
+        return g.get('sql_tracker')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's context, so a statement that raises leaves nothing behind
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = context._query_started
+    tracker = current_tracker()
+    if tracker is not None:
+        tracker.record(statement, time.perf_counter() - started)
+
+
+def _start_request():
+    g.sql_tracker = RequestTracker()
+
+
+def _finish_request(response):
+    tracker = g.pop('sql_tracker', None)
+    if tracker is None:
+        return response
+
+    elapsed = time.perf_counter() - tracker.started
+    endpoint = request.endpoint or 'unmatched'
+
+    repeated = tracker.repeated_statements(current_app.config['N_PLUS_ONE_THRESHOLD'])
+    for statement, count in repeated:
+        logging.warning(f"Possible N+1 in {endpoint}: {count}x {' '.join(statement.split())[:200]}")
+
+    slow_threshold = current_app.config['SLOW_QUERY_MS'] / 1000
+    slow = [(seconds, statement) for seconds, statement in tracker.slowest if seconds >= slow_threshold]
+    for seconds, statement in slow:
+        logging.warning(f"Slow query in {endpoint} ({seconds * 1000:.1f}ms): {' '.join(statement.split())[:200]}")
+
+    registry.observe(endpoint, tracker, elapsed, 1 if repeated else 0, len(slow))
+
+    # Streamed bodies run after this point, so their queries are not counted here
+    response.headers.add('Server-Timing', f'db;dur={tracker.db_seconds * 1000:.2f};desc="{tracker.query_count} queries"')
+    response.headers.add('Server-Timing', f'app;dur={elapsed * 1000:.2f}')
+    return response
+
+
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+def init_app(app):
+    """Record per-request SQL activity and serve it on /metrics"""
+    global _listening
+
+    if not _listening:
+        # Listening on the Engine class covers every engine and bind
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics)
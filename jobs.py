@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update, delete, or_
+from app import db
+from models import Job, EvaluationSession
+from exports import iter_json, iter_ndjson, EXPORT_FORMATS
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+MAX_ATTEMPTS = 3  # runs abandoned by a dead worker before the job is failed
+POLL_SECONDS = 2.0
+EXPIRE_SECONDS = 3600  # how often a runner deletes jobs older than JOB_RETENTION_DAYS
+
+
+def export_params(params):
+    """Validate export job params; returns (params, None) or (None, error message)"""
+    try:
+        session_id = int(params.get('session_id'))
+    except (TypeError, ValueError):
+        return None, 'session_id must be an integer'
+    export_format = params.get('format') or 'json'
+    if export_format not in EXPORT_FORMATS:
+        return None, f'Unsupported format: {export_format}'
+    if db.session.get(EvaluationSession, session_id) is None:
+        return None, f'Session {session_id} not found'
+    return {'session_id': session_id, 'format': export_format}, None
+
+
+def run_export(params, stream):
+    """Write a session export; returns (mimetype, download filename)"""
+    session = db.session.get(EvaluationSession, params['session_id'])
+    if session is None:
+        raise LookupError(f"Session {params['session_id']} no longer exists")
+    if params['format'] == 'ndjson':
+        body, mimetype = iter_ndjson(session), 'application/x-ndjson'
+    else:
+        body, mimetype = iter_json(session), 'application/json'
+    for chunk in body:
+        stream.write(chunk)
+    return mimetype, f"evaluation_session_{session.id}.{params['format']}"
+
+
+def analytics_job_params(params):
+    # Imported here so workers do not pay for NumPy until analytics is used
+    from analytics import analytics_params
+    return analytics_params(params)
+
+
+def run_analytics(params, stream):
+    """Write the /api/analytics report; returns (mimetype, download filename)"""
+    from analytics import analytics_report
+    json.dump(analytics_report(**params), stream, indent=2)
+    return 'application/json', 'analytics.json'
+
+
+# kind -> (validate params, write the result)
+JOB_KINDS = {
+    'export': (export_params, run_export),
+    'analytics': (analytics_job_params, run_analytics),
+}
+
+
+def validate_job(kind, params):
+    """Returns (normalized params, None) or (None, error message)"""
+    if kind not in JOB_KINDS:
+        return None, f"Unknown job kind '{kind}', expected one of {', '.join(JOB_KINDS)}"
+    if not isinstance(params, dict):
+        return None, 'params must be an object'
+    validate, _ = JOB_KINDS[kind]
+    return validate(params)
+
+
+def submit_job(kind, params):
+    """Queue a validated job and nudge this process's runner"""
+    job = Job(kind=kind, params=json.dumps(params), status='queued')
+    db.session.add(job)
+    db.session.commit()
+    runner = current_app.extensions.get('job_runner')
+    if runner is not None:
+        runner.wake()
+    return job
+
+
+def job_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'params': json.loads(job.params),
+        'status': job.status,
+        'attempts': job.attempts,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error': job.error,
+    }
+
+
+class JobRunner:
+    """Runs queued jobs from the job table on a bounded thread pool.
+
+    A dispatcher thread polls with a plain SELECT and only writes when
+    there is work: it claims queued jobs with a compare-and-set update,
+    only as many as there are free threads, and puts back in the queue
+    jobs whose lease lapsed because their process died, up to
+    MAX_ATTEMPTS runs. Leases of the jobs it is running are renewed a few
+    times per lease, not on every poll.
+    """
+
+    def __init__(self, app, max_workers):
+        self.app = app
+        self.max_workers = max_workers
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._next_renewal = 0
+        self._next_expiry = 0
+
+    def start(self):
+        threading.Thread(target=self.run_forever, name='job-dispatcher', daemon=True).start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def run_forever(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.dispatch()
+            except Exception:
+                logging.exception('Job dispatcher failed')
+            self._wakeup.wait(POLL_SECONDS)
+            self._wakeup.clear()
+
+    def _lease(self, now):
+        return now + timedelta(seconds=self.app.config['JOB_LEASE_SECONDS'])
+
+    def dispatch(self):
+        """One pass: renew our leases when due, requeue abandoned jobs, claim new ones"""
+        now = datetime.utcnow()
+        with self._lock:
+            running = list(self._running)
+        if running and time.monotonic() >= self._next_renewal:
+            db.session.execute(
+                update(Job)
+                .where(Job.id.in_(running), Job.worker == self.name, Job.status == 'running')
+                .values(leased_until=self._lease(now))
+            )
+            db.session.commit()
+            self._next_renewal = time.monotonic() + self.app.config['JOB_LEASE_SECONDS'] / 3
+        if time.monotonic() >= self._next_expiry:
+            expire_jobs(now - timedelta(days=self.app.config['JOB_RETENTION_DAYS']))
+            self._next_expiry = time.monotonic() + EXPIRE_SECONDS
+
+        free = self.max_workers - len(running)
+        abandoned = (Job.status == 'running') & (Job.leased_until < now)
+        due = set(db.session.execute(
+            select(Job.status).where(or_(Job.status == 'queued', abandoned)).distinct()
+        ).scalars())
+        db.session.commit()
+        if 'running' in due:
+            db.session.execute(
+                update(Job).where(abandoned, Job.attempts >= MAX_ATTEMPTS)
+                .values(status='failed', finished_at=now, worker=None, leased_until=None,
+                        error='The worker running this job stopped before it finished')
+            )
+            db.session.execute(
+                update(Job).where(abandoned).values(status='queued', worker=None, leased_until=None)
+            )
+            db.session.commit()
+        if not due or free <= 0:
+            return
+
+        queued = db.session.execute(
+            select(Job.id).where(Job.status == 'queued').order_by(Job.id).limit(free)
+        ).scalars().all()
+        for job_id in queued:
+            # Compare-and-set: another process may claim the same job
+            result = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == 'queued')
+                .values(status='running', worker=self.name, leased_until=self._lease(now),
+                        started_at=now, attempts=Job.attempts + 1)
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                with self._lock:
+                    self._running.add(job_id)
+                self._executor.submit(self._execute, job_id)
+
+    def _execute(self, job_id):
+        with self.app.app_context():
+            try:
+                self._run(job_id)
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+                db.session.remove()
+                self.wake()
+
+    def _run(self, job_id):
+        job = db.session.get(Job, job_id)
+        directory = self.app.config['JOB_RESULTS_DIR']
+        os.makedirs(directory, exist_ok=True)
+        partial = os.path.join(directory, f'job-{job_id}.part')
+        values = {}
+        try:
+            _, run = JOB_KINDS[job.kind]
+            with open(partial, 'w', encoding='utf-8') as stream:
+                mimetype, filename = run(json.loads(job.params), stream)
+            path = os.path.join(directory, f'job-{job_id}-{filename}')
+            os.replace(partial, path)
+            values = dict(status='succeeded', result_path=path, result_mimetype=mimetype,
+                          result_filename=filename)
+        except Exception as e:
+            logging.exception(f'Job {job_id} ({job.kind}) failed')
+            if os.path.exists(partial):
+                os.remove(partial)
+            values = dict(status='failed', error=f'{type(e).__name__}: {e}')
+        db.session.rollback()
+        # Only record the outcome if the job is still ours
+        db.session.execute(
+            update(Job).where(Job.id == job_id, Job.worker == self.name)
+            .values(finished_at=datetime.utcnow(), worker=None, leased_until=None, **values)
+        )
+        db.session.commit()
+
+
+def expire_jobs(finished_before):
+    """Delete jobs that finished before ``finished_before`` and their result files.
+
+    Returns the number of jobs deleted.
+    """
+    expired = db.session.execute(
+        select(Job.id, Job.result_path)
+        .where(Job.status.in_(('succeeded', 'failed')), Job.finished_at < finished_before)
+    ).all()
+    for _, path in expired:
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    if expired:
+        db.session.execute(delete(Job).where(Job.id.in_([job_id for job_id, _ in expired])))
+    db.session.commit()
+    return len(expired)
+
+
+def get_runner(app):
+    """This process's runner, started on first use (after any fork)"""
+    runner = app.extensions.get('job_runner')
+    if runner is None or runner.pid != os.getpid():
+        runner = JobRunner(app, app.config['JOB_WORKERS'])
+        app.extensions['job_runner'] = runner
+        runner.start()
+    return runner
+
+
+def init_app(app):
+    """Run background jobs in this web process once it serves its first request.
+
+    Only used when JOB_WORKERS > 0; by default jobs run in a single
+    ``flask run-jobs`` process instead of one dispatcher per web worker.
+    """
+    lock = threading.Lock()
+
+    def ensure_runner():
+        runner = app.extensions.get('job_runner')
+        if runner is None or runner.pid != os.getpid():
+            with lock:
+                get_runner(app)
+
+    app.before_request(ensure_runner)
@@ -0,0 +1,268 @@
+import hashlib
+import re
+import zlib
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, update, delete, bindparam, or_
+from app import db
+from models import LLMResponse, ResponseSignature, SignatureBand, WorkItem
+from blobs import load_texts
+
+NUM_PERMUTATIONS = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS  # 16 bands of 8 rows: pairs at 0.8 Jaccard collide ~95% of the time
+SHINGLE_SIZE = 3  # words per shingle
+SIGN_CHUNK_SHINGLES = 50000  # bounds the (shingles x permutations) matrix hashed at once
+LOOKUP_CHUNK = 5000
+DEDUPE_BATCH_SIZE = 5000
+
+_BUCKET_MASK = (1 << 63) - 1  # buckets are stored in a signed BIGINT
+# Stored for responses without words, so dedupe_existing treats them as signed
+_UNSIGNED = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+# Fixed seed: signatures must be comparable across processes and restarts
+_permutations = np.random.RandomState(1)
+_A = _permutations.randint(0, 1 << 63, NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)  # odd
+_B = _permutations.randint(0, 1 << 63, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def shingles(text):
+    """Overlapping word n-grams of lower-cased text; empty for text without words"""
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return set()
+    if len(words) <= SHINGLE_SIZE:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _feature_hashes(prompt, response):
+    features = {f'p:{s}' for s in shingles(prompt)} | {f'r:{s}' for s in shingles(response)}
+    return [zlib.crc32(f.encode('utf-8')) for f in features]
+
+
+def _min_hashes(hashes, offsets):
+    # Multiply-shift hashing (high 32 bits of a*x + b, wrapping at 2**64)
+    # stands in for NUM_PERMUTATIONS random permutations; each document's
+    # signature is the column-wise minimum over its own rows, which start
+    # at ``offsets``.
+    permuted = (np.outer(np.asarray(hashes, dtype=np.uint64), _A) + _B) >> np.uint64(32)
+    return np.minimum.reduceat(permuted, offsets, axis=0).astype(np.uint32)
+
+
+def signature(prompt, response):
+    """MinHash signature over the prompt and response shingles, as uint32[NUM_PERMUTATIONS].
+
+    None when neither has any words: such texts have nothing to compare,
+    and would otherwise all share one signature.
+    """
+    hashes = _feature_hashes(prompt, response)
+    return _min_hashes(hashes, [0])[0] if hashes else None
+
+
+def signatures(rows):
+    """Signatures for many (prompt, response) pairs, hashed a chunk of documents at a time"""
+    result = []
+    hashes, offsets, positions = [], [], []
+
+    def sign_chunk():
+        for position, sig in zip(positions, _min_hashes(hashes, offsets)):
+            result[position] = sig
+
+    for prompt, response in rows:
+        features = _feature_hashes(prompt, response)
+        result.append(None)
+        if not features:
+            continue
+        positions.append(len(result) - 1)
+        offsets.append(len(hashes))
+        hashes.extend(features)
+        if len(hashes) >= SIGN_CHUNK_SHINGLES:
+            sign_chunk()
+            hashes, offsets, positions = [], [], []
+    if offsets:
+        sign_chunk()
+    return result
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(first == second)) / NUM_PERMUTATIONS
+
+
+def band_buckets(sig, model_name):
+    """LSH bucket per band. Responses only cluster within the same model."""
+    prefix = (model_name or '').encode('utf-8') + b'\x1f'
+    buckets = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(prefix + bytes([band]) + rows.tobytes(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little') & _BUCKET_MASK)
+    return buckets
+
+
+def _decode(blob):
+    return np.frombuffer(blob, dtype=np.uint32)
+
+
+def _bucket_members(buckets):
+    """Representatives already stored in any of ``buckets``, in chunked IN lookups"""
+    buckets = list(buckets)
+    members = {}
+    for start in range(0, len(buckets), LOOKUP_CHUNK):
+        chunk = buckets[start:start + LOOKUP_CHUNK]
+        for bucket, response_id in db.session.execute(
+            select(SignatureBand.bucket, SignatureBand.response_id).where(SignatureBand.bucket.in_(chunk))
+        ):
+            members.setdefault(bucket, []).append(response_id)
+    return members
+
+
+def _stored_signatures(response_ids):
+    response_ids = list(response_ids)
+    signatures = {}
+    for start in range(0, len(response_ids), LOOKUP_CHUNK):
+        chunk = response_ids[start:start + LOOKUP_CHUNK]
+        for response_id, blob in db.session.execute(
+            select(ResponseSignature.response_id, ResponseSignature.signature)
+            .where(ResponseSignature.response_id.in_(chunk))
+        ):
+            signatures[response_id] = _decode(blob)
+    return signatures
+
+
+def assign_clusters(rows):
+    """Sign new responses and attach each to a near-duplicate cluster.
+
+    ``rows`` are dicts with id, prompt, response and model_name. Each row
+    is compared only with the cluster representatives that share one of
+    its LSH buckets, never with the whole corpus; a row whose estimated
+    similarity to one of them reaches NEAR_DUPLICATE_THRESHOLD joins that
+    cluster, otherwise it becomes a representative and is added to the band
+    index. Only representatives are indexed, so buckets stay small however
+    large a cluster grows. Rows without any words are never clustered.
+
+    Returns the ids of the rows that became representatives. Runs in the
+    caller's transaction.
+    """
+    threshold = current_app.config['NEAR_DUPLICATE_THRESHOLD']
+    rows = sorted(rows, key=lambda row: row['id'])
+    sigs = signatures((row['prompt'], row['response']) for row in rows)
+    signed = [(row['id'], sig, band_buckets(sig, row.get('model_name')) if sig is not None else [])
+              for row, sig in zip(rows, sigs)]
+
+    members = _bucket_members({bucket for _, _, buckets in signed for bucket in buckets})
+    known = _stored_signatures({response_id for ids in members.values() for response_id in ids})
+
+    representatives = []
+    duplicates = []
+    bands = []
+    for response_id, sig, buckets in signed:
+        if sig is None:
+            representatives.append(response_id)
+            continue
+        candidates = {candidate for bucket in buckets for candidate in members.get(bucket, ())}
+        best, best_score = None, 0.0
+        for candidate in sorted(candidates):
+            score = similarity(sig, known[candidate])
+            if score >= threshold and score > best_score:
+                best, best_score = candidate, score
+        if best is not None:
+            duplicates.append({'response_id': response_id, 'representative_id': best})
+            continue
+
+        # New representative: later rows in this batch can match it too
+        representatives.append(response_id)
+        known[response_id] = sig
+        for bucket in buckets:
+            members.setdefault(bucket, []).append(response_id)
+            bands.append({'bucket': bucket, 'response_id': response_id})
+
+    db.session.execute(ResponseSignature.__table__.insert(), [
+        {'response_id': response_id, 'signature': (sig if sig is not None else _UNSIGNED).tobytes()}
+        for response_id, sig, _ in signed
+    ])
+    if bands:
+        db.session.execute(SignatureBand.__table__.insert(), bands)
+    if duplicates:
+        db.session.execute(
+            update(LLMResponse.__table__)
+            .where(LLMResponse.__table__.c.id == bindparam('response_id'))
+            .values(duplicate_of=bindparam('representative_id')),
+            duplicates
+        )
+    return representatives
+
+
+def retire_duplicate_work():
+    """Drop open work items for responses that now belong to another cluster.
+
+    Items currently leased are left for their evaluator to finish. Returns
+    the number of items removed. Runs in the caller's transaction.
+    """
+    duplicates = select(LLMResponse.id).where(LLMResponse.duplicate_of.isnot(None))
+    result = db.session.execute(
+        delete(WorkItem)
+        .where(WorkItem.response_id.in_(duplicates), WorkItem.leased_until.is_(None))
+    )
+    return result.rowcount
+
+
+def dedupe_existing(batch_size=DEDUPE_BATCH_SIZE):
+    """Sign and cluster every response that has no signature yet, oldest first.
+
+    Commits after each batch. Returns (signed, duplicates, work items retired).
+    """
+    signed = duplicates = 0
+    while True:
+        unsigned = db.session.execute(
+            select(LLMResponse.id, LLMResponse.prompt_hash, LLMResponse.response_hash, LLMResponse.model_name)
+            .outerjoin(ResponseSignature, ResponseSignature.response_id == LLMResponse.id)
+            .where(ResponseSignature.response_id.is_(None))
+            .order_by(LLMResponse.id)
+            .limit(batch_size)
+        ).all()
+        if not unsigned:
+            break
+        texts = load_texts([h for row in unsigned for h in (row.prompt_hash, row.response_hash)], cache=False)
+        representatives = assign_clusters([
+            {'id': row.id, 'prompt': texts[row.prompt_hash], 'response': texts[row.response_hash],
+             'model_name': row.model_name}
+            for row in unsigned
+        ])
+        signed += len(unsigned)
+        duplicates += len(unsigned) - len(representatives)
+        db.session.commit()
+
+    retired = retire_duplicate_work()
+    db.session.commit()
+    return signed, duplicates, retired
+
+
+def cluster(response_id):
+    """The near-duplicate cluster a response belongs to.
+
+    Returns (representative_id, [(member_id, model_name, similarity to
+    the representative)]) with the representative first, or None if the
+    response does not exist.
+    """
+    response = db.session.get(LLMResponse, response_id)
+    if response is None:
+        return None
+    representative_id = response.duplicate_of or response.id
+
+    rows = db.session.execute(
+        select(LLMResponse.id, LLMResponse.model_name)
+        .where(or_(LLMResponse.id == representative_id, LLMResponse.duplicate_of == representative_id))
+        .order_by(LLMResponse.id)
+    ).all()
+    signatures = _stored_signatures([row.id for row in rows])
+    reference = signatures.get(representative_id)
+
+    members = []
+    for row in rows:
+        score = similarity(reference, signatures[row.id]) \
+            if reference is not None and row.id in signatures else None
+        members.append((row.id, row.model_name, score))
+    members.sort(key=lambda member: member[0] != representative_id)
+    return representative_id, members
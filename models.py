@@ -1,7 +1,14 @@
+import hashlib
 from datetime import datetime
 from app import db
 
 class EvaluationSession(db.Model):
+    __table_args__ = (
+        db.Index('ix_evaluation_session_created_at_id', 'created_at', 'id'),
+        db.Index('ix_evaluation_session_status_created_at_id', 'status', 'created_at', 'id'),
+        db.Index('ix_evaluation_session_completed_at_id', 'completed_at', 'id'),  # change feed
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     evaluator_name = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -14,11 +21,24 @@ class EvaluationSession(db.Model):
     def __repr__(self):
         return f'<EvaluationSession {self.id}: {self.evaluator_name}>'
 
+class TextBlob(db.Model):
+    """Compressed prompt or response text, stored once however many responses share it"""
+    __tablename__ = 'text_blob'
+
+    hash = db.Column(db.String(64), primary_key=True)  # sha256 of the UTF-8 text
+    codec = db.Column(db.String(10), nullable=False)  # zlib, zstd, raw
+    size = db.Column(db.Integer, nullable=False)  # uncompressed bytes
+    data = db.Column(db.LargeBinary, nullable=False)
+
 class LLMResponse(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    prompt = db.Column(db.Text, nullable=False)
-    response = db.Column(db.Text, nullable=False)
+    # Text lives in text_blob; rows only carry its address, so listings never load it
+    prompt_hash = db.Column(db.String(64), db.ForeignKey('text_blob.hash'), nullable=False)
+    response_hash = db.Column(db.String(64), db.ForeignKey('text_blob.hash'), nullable=False)
     model_name = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64), unique=True)  # sha256 of prompt, response and model
+    # Representative of this response's near-duplicate cluster; None for representatives
+    duplicate_of = db.Column(db.Integer, db.ForeignKey('llm_response.id'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship to evaluations
@@ -26,10 +46,33 @@ class LLMResponse(db.Model):
     
     def __repr__(self):
         return f'<LLMResponse {self.id}: {self.model_name}>'
+    
+    @property
+    def prompt(self):
+        """Prompt text, decompressed on first access and kept in the worker's LRU"""
+        from blobs import load_text
+        return load_text(self.prompt_hash)
+    
+    @property
+    def response(self):
+        """Response text, decompressed on first access and kept in the worker's LRU"""
+        from blobs import load_text
+        return load_text(self.response_hash)
+    
+    @staticmethod
+    def compute_hash(prompt, response, model_name):
+        """Content hash used to deduplicate ingested responses"""
+        content = '\x1f'.join([prompt, response, model_name or ''])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
 class Evaluation(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'response_id', name='uq_evaluation_session_response'),
+        db.Index('ix_evaluation_created_at_id', 'created_at', 'id'),  # change feed
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.Integer, db.ForeignKey('evaluation_session.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('evaluation_session.id'), nullable=False, index=True)
     response_id = db.Column(db.Integer, db.ForeignKey('llm_response.id'), nullable=False)
     
     # Rating criteria (1-5 scale)
@@ -57,19 +100,133 @@ class Evaluation(db.Model):
     @property
     def average_rating(self):
         """Calculate average rating across all criteria"""
-        ratings = [self.helpfulness, self.correctness, self.coherence, 
-                  self.empathy_tone, self.safety]
-        valid_ratings = [r for r in ratings if r is not None]
-        return sum(valid_ratings) / len(valid_ratings) if valid_ratings else 0
+        return self.average_of([self.helpfulness, self.correctness, self.coherence, 
+                                self.empathy_tone, self.safety])
     
     @property
     def risk_level(self):
         """Determine risk level based on safety rating"""
-        if self.safety is None:
+        return self.risk_level_for(self.safety)
+    
+    @staticmethod
+    def average_of(ratings):
+        """Average of the non-empty ratings, 0 if none were given"""
+        valid_ratings = [r for r in ratings if r is not None]
+        return sum(valid_ratings) / len(valid_ratings) if valid_ratings else 0
+    
+    @staticmethod
+    def risk_level_for(safety):
+        """Map a safety rating to a risk level"""
+        if safety is None:
             return 'unknown'
-        elif self.safety <= 2:
+        elif safety <= 2:
             return 'high'
-        elif self.safety <= 3:
+        elif safety <= 3:
             return 'medium'
         else:
             return 'low'
+
+class SessionStats(db.Model):
+    """Incrementally maintained per-session rollup of evaluation ratings"""
+    session_id = db.Column(db.Integer, db.ForeignKey('evaluation_session.id'), primary_key=True)
+    evaluation_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Per-criterion sums and counts of non-empty ratings
+    helpfulness_sum = db.Column(db.Integer, nullable=False, default=0)
+    helpfulness_count = db.Column(db.Integer, nullable=False, default=0)
+    correctness_sum = db.Column(db.Integer, nullable=False, default=0)
+    correctness_count = db.Column(db.Integer, nullable=False, default=0)
+    coherence_sum = db.Column(db.Integer, nullable=False, default=0)
+    coherence_count = db.Column(db.Integer, nullable=False, default=0)
+    empathy_tone_sum = db.Column(db.Integer, nullable=False, default=0)
+    empathy_tone_count = db.Column(db.Integer, nullable=False, default=0)
+    safety_sum = db.Column(db.Integer, nullable=False, default=0)
+    safety_count = db.Column(db.Integer, nullable=False, default=0)
+    overall_rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    overall_rating_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Sum of Evaluation.average_rating, for the session-wide mean
+    average_rating_sum = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # Risk histogram and revision count
+    risk_high = db.Column(db.Integer, nullable=False, default=0)
+    risk_medium = db.Column(db.Integer, nullable=False, default=0)
+    risk_low = db.Column(db.Integer, nullable=False, default=0)
+    risk_unknown = db.Column(db.Integer, nullable=False, default=0)
+    revision_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SessionStats {self.session_id}: {self.evaluation_count} evaluations>'
+
+class WorkItem(db.Model):
+    """One outstanding rating slot for a response; deleted once rated"""
+    __table_args__ = (
+        db.Index('ix_work_item_slot_response', 'slot', 'response_id'),
+        db.Index('ix_work_item_session_response', 'session_id', 'response_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('llm_response.id'), nullable=False)
+    slot = db.Column(db.Integer, nullable=False, default=0)  # lower slots are served first
+    
+    # Current lease, if any
+    session_id = db.Column(db.Integer, db.ForeignKey('evaluation_session.id'))
+    leased_until = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<WorkItem {self.id}: Response {self.response_id} slot {self.slot}>'
+
+class DataVersion(db.Model):
+    """Single-row counter bumped by every write that changes cached pages"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.version}>'
+
+class ResponseSignature(db.Model):
+    """MinHash signature of a response's prompt and text, for near-duplicate detection"""
+    response_id = db.Column(db.Integer, db.ForeignKey('llm_response.id'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)
+    
+    def __repr__(self):
+        return f'<ResponseSignature {self.response_id}>'
+
+class SignatureBand(db.Model):
+    """LSH index: cluster representatives whose signatures agree on a whole band share a bucket"""
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    response_id = db.Column(db.Integer, db.ForeignKey('llm_response.id'), primary_key=True)
+    
+    def __repr__(self):
+        return f'<SignatureBand {self.bucket}: Response {self.response_id}>'
+
+class Job(db.Model):
+    """A background export or analytics run; the table is the queue, so jobs survive restarts"""
+    __table_args__ = (
+        db.Index('ix_job_status_id', 'status', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # export, analytics
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    # Held by the process running the job and renewed while it runs
+    worker = db.Column(db.String(100))
+    leased_until = db.Column(db.DateTime)
+    
+    result_path = db.Column(db.String(500))
+    result_mimetype = db.Column(db.String(100))
+    result_filename = db.Column(db.String(200))
+    error = db.Column(db.Text)
+    
+    def __repr__(self):
+        return f'<Job {self.id}: {self.kind} {self.status}>'
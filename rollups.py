@@ -0,0 +1,149 @@
+from datetime import datetime
+from sqlalchemy import func, case, update, insert, exists, and_
+from sqlalchemy.dialects import sqlite, postgresql
+from app import db
+from models import Evaluation, EvaluationSession, SessionStats
+from dashboard_data import RATING_CRITERIA, _average_rating_expr
+
+RATED_FIELDS = RATING_CRITERIA + ['overall_rating']
+RISK_LEVELS = ['high', 'medium', 'low', 'unknown']
+
+
+def _empty_deltas():
+    deltas = {'evaluation_count': 0, 'average_rating_sum': 0.0, 'revision_count': 0}
+    for name in RATED_FIELDS:
+        deltas[f'{name}_sum'] = 0
+        deltas[f'{name}_count'] = 0
+    for level in RISK_LEVELS:
+        deltas[f'risk_{level}'] = 0
+    return deltas
+
+
+def evaluation_deltas(rows):
+    """Fold evaluation column dicts into per-session rollup increments"""
+    by_session = {}
+    for row in rows:
+        deltas = by_session.setdefault(int(row['session_id']), _empty_deltas())
+        deltas['evaluation_count'] += 1
+        for name in RATED_FIELDS:
+            value = row.get(name)
+            if value is not None:
+                deltas[f'{name}_sum'] += value
+                deltas[f'{name}_count'] += 1
+        deltas['average_rating_sum'] += Evaluation.average_of([row.get(name) for name in RATING_CRITERIA])
+        deltas[f"risk_{Evaluation.risk_level_for(row.get('safety'))}"] += 1
+        if row.get('requires_revision'):
+            deltas['revision_count'] += 1
+    return by_session
+
+
+def apply_evaluations(rows):
+    """Add new evaluations to their session rollups.
+
+    Runs in the caller's transaction so the rollup commits or rolls back
+    together with the evaluations. Increments are applied as
+    ``column = column + delta`` so concurrent writers do not lose updates.
+    """
+    now = datetime.utcnow()
+    for session_id, deltas in evaluation_deltas(rows).items():
+        values = {name: getattr(SessionStats, name) + delta for name, delta in deltas.items()}
+        values['updated_at'] = now
+        increment = update(SessionStats).where(SessionStats.session_id == session_id).values(**values)
+        if db.session.execute(increment).rowcount:
+            continue
+        # No rollup yet (a session from before rollups existed): compute it from
+        # the evaluations, including the ones flushed in this transaction. If a
+        # concurrent first submit inserted it meanwhile, add our delta to theirs.
+        row = _aggregate_query().filter(EvaluationSession.id == session_id).one()
+        if not _insert_missing(dict(row._mapping, updated_at=now)).rowcount:
+            db.session.execute(increment)
+
+
+def _insert_missing(rows):
+    """Insert rollup rows, skipping sessions that already have one"""
+    table = SessionStats.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        statement = sqlite.insert(table).on_conflict_do_nothing(index_elements=['session_id'])
+    elif dialect == 'postgresql':
+        statement = postgresql.insert(table).on_conflict_do_nothing(index_elements=['session_id'])
+    else:
+        statement = insert(table)
+    return db.session.execute(statement, rows)
+
+
+def _zero(expr):
+    return func.coalesce(expr, 0)
+
+
+def _aggregate_query():
+    # Outer join from the sessions, so sessions without evaluations get a zero rollup
+    columns = [
+        EvaluationSession.id.label('session_id'),
+        func.count(Evaluation.id).label('evaluation_count'),
+        func.coalesce(func.sum(_average_rating_expr()), 0.0).label('average_rating_sum'),
+        _zero(func.sum(case((Evaluation.requires_revision.is_(True), 1), else_=0))).label('revision_count'),
+        _zero(func.sum(case((Evaluation.safety <= 2, 1), else_=0))).label('risk_high'),
+        _zero(func.sum(case((and_(Evaluation.safety > 2, Evaluation.safety <= 3), 1), else_=0))).label('risk_medium'),
+        _zero(func.sum(case((Evaluation.safety > 3, 1), else_=0))).label('risk_low'),
+        _zero(func.sum(case((and_(Evaluation.id.isnot(None), Evaluation.safety.is_(None)), 1), else_=0))).label('risk_unknown'),
+    ]
+    for name in RATED_FIELDS:
+        column = getattr(Evaluation, name)
+        columns.append(_zero(func.sum(column)).label(f'{name}_sum'))
+        columns.append(func.count(column).label(f'{name}_count'))
+    return db.session.query(*columns) \
+        .outerjoin(Evaluation, Evaluation.session_id == EvaluationSession.id) \
+        .group_by(EvaluationSession.id)
+
+
+def rebuild_session_stats(session_ids=None):
+    """Recompute rollups from the evaluation table, for all or some sessions.
+
+    Every session gets a row, zeroed when it has no evaluations. Returns
+    the number of rollup rows written. Does not commit.
+    """
+    query = _aggregate_query()
+    stale = db.session.query(SessionStats)
+    if session_ids is not None:
+        query = query.filter(EvaluationSession.id.in_(session_ids))
+        stale = stale.filter(SessionStats.session_id.in_(session_ids))
+    stale.delete(synchronize_session=False)
+
+    now = datetime.utcnow()
+    rows = [dict(row._mapping, updated_at=now) for row in query]
+    if rows:
+        db.session.execute(SessionStats.__table__.insert(), rows)
+    return len(rows)
+
+
+def backfill_session_stats():
+    """Write rollups for the sessions that have none, such as ones created
+    before rollups existed. Returns the number written. Does not commit.
+    """
+    query = _aggregate_query().filter(~exists().where(SessionStats.session_id == EvaluationSession.id))
+    now = datetime.utcnow()
+    rows = [dict(row._mapping, updated_at=now) for row in query]
+    if rows:
+        _insert_missing(rows)
+    return len(rows)
+
+
+def get_session_stats(session_id):
+    """Return the rollup for a session.
+
+    Only reads: a session without a rollup row (until ``init-db`` or the
+    next submission writes one) gets unsaved stats computed from its
+    evaluations.
+    """
+    stats = db.session.get(SessionStats, session_id)
+    if stats is None:
+        row = _aggregate_query().filter(EvaluationSession.id == session_id).first()
+        stats = SessionStats(**row._mapping) if row else SessionStats(session_id=session_id, **_empty_deltas())
+    return stats
+
+
+def average(stats, name):
+    """Mean of one rated field from a rollup row, None if nothing was rated"""
+    count = getattr(stats, f'{name}_count')
+    return getattr(stats, f'{name}_sum') / count if count else None
@@ -1,47 +1,85 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, make_response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context, send_file
 from datetime import datetime
-import json
-from app import app, db
-from models import EvaluationSession, LLMResponse, Evaluation
+from app import db
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from models import EvaluationSession, LLMResponse, Evaluation, SessionStats, Job
 from forms import EvaluationForm, SessionForm
+from assignment import claim_next, claim_many, complete_assignments, release_leases
+from batch import submit_batch, MAX_BATCH_SIZE
+from blobs import prefetch_texts
+from cache import cached, conditional_page, bump_data_version
+from changes import change_page, decode_cursor as decode_change_cursor, DEFAULT_CHANGE_LIMIT
+from dashboard_data import session_page, dashboard_totals, DEFAULT_PAGE_SIZE
+from exports import iter_json, iter_ndjson, EXPORT_FORMATS
+from ingest import ingest_jsonl, DEFAULT_BATCH_SIZE
+from jobs import validate_job, submit_job, job_dict
+from rollups import apply_evaluations, get_session_stats, average, RATED_FIELDS
+from routing import read_only
+from search import search, index_evaluations, search_backend, SEARCH_KINDS, RISK_FILTERS, \
+    DEFAULT_PAGE_SIZE as SEARCH_PAGE_SIZE, MAX_PAGE
 
-@app.route('/')
+bp = Blueprint('main', __name__)
+
+# Most responses a client may lease ahead through /api/sessions/<id>/next
+MAX_PREFETCH = 10
+
+@bp.route('/')
+@read_only
 def index():
     """Homepage with overview and navigation"""
-    recent_sessions = EvaluationSession.query.order_by(EvaluationSession.created_at.desc()).limit(5).all()
-    total_sessions = EvaluationSession.query.count()
-    total_evaluations = Evaluation.query.count()
+    def render():
+        recent = cached('recent_sessions', session_page, None, None, 5)
+        totals = cached('dashboard_totals', dashboard_totals)
+        return render_template('index.html', 
+                             recent_sessions=recent['rows'],
+                             total_sessions=totals['total_sessions'],
+                             total_evaluations=totals['total_evaluations'])
     
-    return render_template('index.html', 
-                         recent_sessions=recent_sessions,
-                         total_sessions=total_sessions,
-                         total_evaluations=total_evaluations)
+    return conditional_page(render)
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
+@read_only
 def dashboard():
-    """Dashboard showing all evaluation sessions"""
-    sessions = EvaluationSession.query.order_by(EvaluationSession.created_at.desc()).all()
-    return render_template('dashboard.html', sessions=sessions)
+    """Dashboard showing evaluation sessions, one keyset page at a time"""
+    status = request.args.get('status')
+    per_page = request.args.get('per_page', type=int)
+    
+    def render():
+        page = cached('session_page', session_page, status, request.args.get('cursor'),
+                      per_page or DEFAULT_PAGE_SIZE)
+        return render_template('dashboard.html',
+                             rows=page['rows'],
+                             next_cursor=page['next_cursor'],
+                             status=status,
+                             per_page=per_page,
+                             totals=cached('dashboard_totals', dashboard_totals))
+    
+    return conditional_page(render)
 
-@app.route('/session/<int:session_id>')
+@bp.route('/session/<int:session_id>')
+@read_only
 def session_detail(session_id):
     """View details of a specific evaluation session"""
     session = EvaluationSession.query.get_or_404(session_id)
-    evaluations = Evaluation.query.filter_by(session_id=session_id).all()
+    evaluations = Evaluation.query.filter_by(session_id=session_id) \
+        .options(joinedload(Evaluation.llm_response)).all()
+    prefetch_texts([evaluation.llm_response for evaluation in evaluations])
     
-    # Calculate session statistics
-    total_evaluations = len(evaluations)
-    avg_rating = sum([e.average_rating for e in evaluations]) / total_evaluations if evaluations else 0
-    high_risk_count = sum([1 for e in evaluations if e.risk_level == 'high'])
+    # Session statistics come from the rollup, not from the rows above
+    stats = get_session_stats(session_id)
+    total_evaluations = stats.evaluation_count if stats else 0
+    avg_rating = stats.average_rating_sum / total_evaluations if total_evaluations else 0
     
     return render_template('session_detail.html', 
                          session=session, 
                          evaluations=evaluations,
                          total_evaluations=total_evaluations,
                          avg_rating=avg_rating,
-                         high_risk_count=high_risk_count)
+                         high_risk_count=stats.risk_high if stats else 0,
+                         revision_count=stats.revision_count if stats else 0)
 
-@app.route('/start_session', methods=['GET', 'POST'])
+@bp.route('/start_session', methods=['GET', 'POST'])
 def start_session():
     """Start a new evaluation session"""
     form = SessionForm()
@@ -51,29 +89,30 @@ def start_session():
             evaluator_name=form.evaluator_name.data
         )
         db.session.add(session)
+        db.session.flush()
+        db.session.add(SessionStats(session_id=session.id))
+        bump_data_version()
         db.session.commit()
         
         flash(f'Evaluation session started for {form.evaluator_name.data}', 'success')
-        return redirect(url_for('evaluate', session_id=session.id))
+        return redirect(url_for('.evaluate', session_id=session.id))
     
     return render_template('evaluate.html', form=form, session=None)
 
-@app.route('/evaluate/<int:session_id>')
+@bp.route('/evaluate/<int:session_id>')
 def evaluate(session_id):
     """Main evaluation interface"""
     session = EvaluationSession.query.get_or_404(session_id)
     
-    # Get a random LLM response that hasn't been evaluated in this session yet
-    evaluated_response_ids = [e.response_id for e in session.evaluations]
-    
-    if evaluated_response_ids:
-        response = LLMResponse.query.filter(~LLMResponse.id.in_(evaluated_response_ids)).first()
-    else:
-        response = LLMResponse.query.first()
+    # Lease the next response this session has not rated from the work queue
+    response_id = claim_next(session_id)
+    response = db.session.get(LLMResponse, response_id) if response_id else None
     
     if not response:
         flash('No more responses to evaluate in this session.', 'info')
-        return redirect(url_for('session_detail', session_id=session_id))
+        return redirect(url_for('.session_detail', session_id=session_id))
+    
+    prefetch_texts([response])
     
     form = EvaluationForm()
     
@@ -82,15 +121,41 @@ def evaluate(session_id):
                          session=session, 
                          response=response)
 
-@app.route('/submit_evaluation', methods=['POST'])
+@bp.route('/api/sessions/<int:session_id>/next')
+def next_responses(session_id):
+    """Lease the next few responses for a session, for clients that prefetch.
+
+    Uses the same work queue as the evaluate page; responses the session
+    already holds are returned first with their leases renewed.
+    """
+    session = EvaluationSession.query.get_or_404(session_id)
+    if session.status != 'in_progress':
+        return jsonify({'error': f'Session {session_id} is {session.status}'}), 409
+    count = max(1, min(request.args.get('count', 1, type=int), MAX_PREFETCH))
+    
+    response_ids = claim_many(session_id, count)
+    responses = {r.id: r for r in LLMResponse.query.filter(LLMResponse.id.in_(response_ids))} if response_ids else {}
+    prefetch_texts(responses.values())
+    
+    return jsonify({
+        'session_id': session_id,
+        'items': [{
+            'id': response.id,
+            'prompt': response.prompt,
+            'response': response.response,
+            'model_name': response.model_name,
+        } for response in (responses.get(response_id) for response_id in response_ids) if response],
+    })
+
+@bp.route('/submit_evaluation', methods=['POST'])
 def submit_evaluation():
     """Submit an evaluation for an LLM response"""
     form = EvaluationForm()
     
     if form.validate_on_submit():
-        evaluation = Evaluation(
-            session_id=form.session_id.data,
-            response_id=form.response_id.data,
+        values = dict(
+            session_id=int(form.session_id.data),
+            response_id=int(form.response_id.data),
             helpfulness=form.helpfulness.data,
             correctness=form.correctness.data,
             coherence=form.coherence.data,
@@ -104,11 +169,23 @@ def submit_evaluation():
             requires_revision=form.requires_revision.data
         )
         
+        evaluation = Evaluation(**values)
         db.session.add(evaluation)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            flash('This response was already evaluated in this session.', 'info')
+            return redirect(url_for('.evaluate', session_id=values['session_id']))
+        
+        apply_evaluations([values])
+        index_evaluations([dict(values, id=evaluation.id)])
+        complete_assignments([(values['session_id'], values['response_id'])])
+        bump_data_version()
         db.session.commit()
         
         flash('Evaluation submitted successfully!', 'success')
-        return redirect(url_for('evaluate', session_id=form.session_id.data))
+        return redirect(url_for('.evaluate', session_id=form.session_id.data))
     
     # If form validation fails, redirect back with errors
     session = EvaluationSession.query.get(form.session_id.data)
@@ -120,97 +197,207 @@ def submit_evaluation():
     
     return render_template('evaluate.html', form=form, session=session, response=response)
 
-@app.route('/complete_session/<int:session_id>')
+@bp.route('/complete_session/<int:session_id>')
 def complete_session(session_id):
     """Mark a session as completed"""
     session = EvaluationSession.query.get_or_404(session_id)
     session.status = 'completed'
     session.completed_at = datetime.utcnow()
+    release_leases(session_id)
+    bump_data_version()
     db.session.commit()
     
     flash('Evaluation session completed!', 'success')
-    return redirect(url_for('session_detail', session_id=session_id))
+    return redirect(url_for('.session_detail', session_id=session_id))
 
-@app.route('/export_session/<int:session_id>')
+@bp.route('/export_session/<int:session_id>')
+@read_only
 def export_session(session_id):
-    """Export session data as JSON"""
+    """Export session data as a streamed JSON or NDJSON download"""
     session = EvaluationSession.query.get_or_404(session_id)
-    evaluations = Evaluation.query.filter_by(session_id=session_id).all()
-    
-    # Prepare export data
-    export_data = {
-        'session': {
-            'id': session.id,
-            'evaluator_name': session.evaluator_name,
-            'created_at': session.created_at.isoformat(),
-            'completed_at': session.completed_at.isoformat() if session.completed_at else None,
-            'status': session.status
-        },
-        'evaluations': []
-    }
-    
-    for eval in evaluations:
-        eval_data = {
-            'id': eval.id,
-            'response': {
-                'prompt': eval.llm_response.prompt,
-                'response': eval.llm_response.response,
-                'model_name': eval.llm_response.model_name
-            },
-            'ratings': {
-                'helpfulness': eval.helpfulness,
-                'correctness': eval.correctness,
-                'coherence': eval.coherence,
-                'empathy_tone': eval.empathy_tone,
-                'safety': eval.safety,
-                'overall_rating': eval.overall_rating
-            },
-            'feedback': {
-                'evaluator_notes': eval.evaluator_notes,
-                'improvement_suggestions': eval.improvement_suggestions,
-                'safety_concerns': eval.safety_concerns,
-                'hallucination_flags': eval.hallucination_flags,
-                'requires_revision': eval.requires_revision
-            },
-            'metrics': {
-                'average_rating': eval.average_rating,
-                'risk_level': eval.risk_level
-            },
-            'created_at': eval.created_at.isoformat()
-        }
-        export_data['evaluations'].append(eval_data)
-    
-    # Create response
-    response = make_response(json.dumps(export_data, indent=2))
-    response.headers['Content-Type'] = 'application/json'
-    response.headers['Content-Disposition'] = f'attachment; filename=evaluation_session_{session_id}.json'
+    export_format = request.args.get('format', 'json')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+    
+    if export_format == 'ndjson':
+        body, mimetype = iter_ndjson(session), 'application/x-ndjson'
+    else:
+        body, mimetype = iter_json(session), 'application/json'
+    
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=evaluation_session_{session_id}.{export_format}'
     
     return response
 
-@app.route('/api/session_stats/<int:session_id>')
+@bp.route('/api/session_stats/<int:session_id>')
+@read_only
 def session_stats(session_id):
-    """API endpoint for session statistics"""
-    evaluations = Evaluation.query.filter_by(session_id=session_id).all()
+    """API endpoint for session statistics, served from the session rollup"""
+    stats = get_session_stats(session_id)
     
-    if not evaluations:
+    if not stats or not stats.evaluation_count:
         return jsonify({'error': 'No evaluations found'})
     
-    stats = {
-        'total_evaluations': len(evaluations),
-        'average_ratings': {
-            'helpfulness': sum([e.helpfulness for e in evaluations if e.helpfulness]) / len([e for e in evaluations if e.helpfulness]),
-            'correctness': sum([e.correctness for e in evaluations if e.correctness]) / len([e for e in evaluations if e.correctness]),
-            'coherence': sum([e.coherence for e in evaluations if e.coherence]) / len([e for e in evaluations if e.coherence]),
-            'empathy_tone': sum([e.empathy_tone for e in evaluations if e.empathy_tone]) / len([e for e in evaluations if e.empathy_tone]),
-            'safety': sum([e.safety for e in evaluations if e.safety]) / len([e for e in evaluations if e.safety]),
-            'overall': sum([e.overall_rating for e in evaluations if e.overall_rating]) / len([e for e in evaluations if e.overall_rating])
-        },
+    averages = {name: average(stats, name) for name in RATED_FIELDS}
+    averages['overall'] = averages.pop('overall_rating')
+    
+    return jsonify({
+        'total_evaluations': stats.evaluation_count,
+        'average_ratings': averages,
         'risk_distribution': {
-            'high': len([e for e in evaluations if e.risk_level == 'high']),
-            'medium': len([e for e in evaluations if e.risk_level == 'medium']),
-            'low': len([e for e in evaluations if e.risk_level == 'low'])
+            'high': stats.risk_high,
+            'medium': stats.risk_medium,
+            'low': stats.risk_low
         },
-        'requires_revision': len([e for e in evaluations if e.requires_revision])
-    }
+        'requires_revision': stats.revision_count
+    })
+
+@bp.route('/api/responses/upload', methods=['POST'])
+def upload_responses():
+    """Bulk-load LLM responses from an uploaded JSONL file or a raw JSONL body"""
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    
+    report = ingest_jsonl(stream,
+                          batch_size=request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int),
+                          prompt_field=request.args.get('prompt_field', 'prompt'),
+                          response_field=request.args.get('response_field', 'response'),
+                          model_field=request.args.get('model_field', 'model_name'))
+    
+    return jsonify(report)
+
+@bp.route('/api/evaluations/batch', methods=['POST'])
+def submit_evaluation_batch():
+    """Submit many evaluations as JSON, validated with the same rules as the evaluation form"""
+    payload = request.get_json(silent=True)
+    items = payload.get('evaluations') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return jsonify({'error': 'Expected a JSON list of evaluations or {"evaluations": [...]}'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} evaluations per batch'}), 413
+    
+    all_or_nothing = request.args.get('atomic', '0') == '1'
+    try:
+        result = submit_batch(items, all_or_nothing=all_or_nothing)
+    except IntegrityError:
+        # A concurrent submission stored one of these pairs after validation
+        return jsonify({'error': 'Some of these responses were evaluated concurrently; resubmit the batch'}), 409
+    if result['errors'] and all_or_nothing:
+        return jsonify(result), 422
+    return jsonify(result), 201 if result['inserted'] else 200
+
+@bp.route('/api/responses/<int:response_id>/duplicates')
+@read_only
+def response_duplicates(response_id):
+    """The near-duplicate cluster a response belongs to"""
+    from minhash import cluster
+    
+    found = cluster(response_id)
+    if found is None:
+        return jsonify({'error': 'Response not found'}), 404
+    representative_id, members = found
+    
+    return jsonify({
+        'response_id': response_id,
+        'representative_id': representative_id,
+        'members': [{
+            'id': member_id,
+            'model_name': model_name,
+            'similarity': similarity,
+        } for member_id, model_name, similarity in members],
+    })
+
+@bp.route('/api/search')
+@read_only
+def search_api():
+    """Ranked full-text search over responses (?kind=responses) or evaluator feedback (?kind=evaluations)"""
+    if search_backend() is None:
+        return jsonify({'error': 'Full-text search needs SQLite (FTS5) or PostgreSQL'}), 501
+    
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('kind', 'responses')
+    risk = request.args.get('risk')
+    rating_field = request.args.get('rating_field', 'overall_rating')
+    if not query:
+        return jsonify({'error': 'Missing search query ?q='}), 400
+    if kind not in SEARCH_KINDS:
+        return jsonify({'error': f"Unknown kind '{kind}', expected one of {', '.join(SEARCH_KINDS)}"}), 400
+    if risk and risk not in RISK_FILTERS:
+        return jsonify({'error': f"Unknown risk '{risk}', expected one of {', '.join(RISK_FILTERS)}"}), 400
+    if rating_field not in RATED_FIELDS:
+        return jsonify({'error': f"Unknown rating_field '{rating_field}', expected one of {', '.join(RATED_FIELDS)}"}), 400
+    
+    page = request.args.get('page', 1, type=int)
+    if not 1 <= page <= MAX_PAGE:
+        return jsonify({'error': f'page must be between 1 and {MAX_PAGE}; refine the query to see other matches'}), 400
+    results = search(query, kind=kind,
+                     model=request.args.get('model'),
+                     risk=risk,
+                     rating_field=rating_field,
+                     min_rating=request.args.get('min_rating', type=int),
+                     max_rating=request.args.get('max_rating', type=int),
+                     page=page,
+                     per_page=request.args.get('per_page', SEARCH_PAGE_SIZE, type=int))
+    return jsonify(dict(results, query=query, kind=kind))
+
+@bp.route('/api/analytics')
+@read_only
+def analytics_summary():
+    """Inter-rater agreement per criterion and per-model score distributions"""
+    # Imported here so workers do not pay for NumPy until analytics is used
+    from analytics import analytics_report, analytics_params
+    
+    params, error = analytics_params(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    return jsonify(analytics_report(**params))
+
+@bp.route('/api/changes')
+@read_only
+def changes():
+    """Evaluations and session completions since ?cursor=, for incremental sync"""
+    cursor = request.args.get('cursor')
+    if cursor and decode_change_cursor(cursor) is None:
+        return jsonify({'error': 'Malformed cursor'}), 400
+    
+    return jsonify(change_page(cursor, limit=request.args.get('limit', DEFAULT_CHANGE_LIMIT, type=int)))
+
+@bp.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue an export or analytics job; poll the returned status_url until it finishes"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object {"kind": ..., "params": {...}}'}), 400
+    
+    params, error = validate_job(payload.get('kind'), payload.get('params') or {})
+    if error:
+        return jsonify({'error': error}), 400
+    
+    job = submit_job(payload['kind'], params)
+    status_url = url_for('.job_status', job_id=job.id)
+    return jsonify(dict(job_dict(job), status_url=status_url)), 202, {'Location': status_url}
+
+@bp.route('/api/jobs/<int:job_id>')
+def job_status(job_id):
+    """A job's status, with result_url once it has succeeded"""
+    job = Job.query.get_or_404(job_id)
+    
+    status = job_dict(job)
+    if job.status == 'succeeded':
+        status['result_url'] = url_for('.job_result', job_id=job.id)
+    return jsonify(status)
+
+@bp.route('/api/jobs/<int:job_id>/result')
+def job_result(job_id):
+    """Download a finished job's result file"""
+    job = Job.query.get_or_404(job_id)
     
-    return jsonify(stats)
+    if job.status != 'succeeded':
+        return jsonify({'error': f'Job {job.id} is {job.status}', 'status': job.status}), 409
+    try:
+        return send_file(job.result_path, mimetype=job.result_mimetype,
+                         as_attachment=True, download_name=job.result_filename)
+    except FileNotFoundError:
+        return jsonify({'error': 'The result file is no longer available; submit the job again'}), 410
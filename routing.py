@@ -0,0 +1,75 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+LAST_WRITE_KEY = 'db_last_write'
+
+
+class RoutingSession(Session):
+    """Sends reads marked read-only to the replica bind and everything else to the primary.
+
+    A SELECT goes to the replica only when the current route is decorated
+    with ``read_only`` (or runs inside ``replica_reads()``), a replica is
+    configured, nothing has been written in this request or app context,
+    and this browser has not written within REPLICA_LAG_SECONDS. Flushes
+    and INSERT/UPDATE/DELETE statements always use the primary and mark
+    the request as a writer.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            if self._flushing or isinstance(clause, UpdateBase):
+                g.db_wrote = True
+            elif isinstance(clause, Select) and _replica_allowed():
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_allowed():
+    if not g.get('read_only') or g.get('db_wrote'):
+        return False
+    if has_request_context():
+        last_write = session.get(LAST_WRITE_KEY)
+        if last_write and time.time() - last_write < current_app.config['REPLICA_LAG_SECONDS']:
+            return False
+    return True
+
+
+def read_only(view):
+    """Mark a route whose queries may be served by the replica"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Left set for the rest of the request so streamed bodies read from the replica too
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def replica_reads():
+    """Let the queries in this block read from the replica"""
+    previous = g.get('read_only', False)
+    g.read_only = True
+    try:
+        yield
+    finally:
+        g.read_only = previous
+
+
+def _remember_write(response):
+    # Read-your-writes: this browser's reads stay on the primary while the replica catches up
+    if g.get('db_wrote'):
+        session[LAST_WRITE_KEY] = time.time()
+    return response
+
+
+def init_app(app):
+    if REPLICA_BIND in app.config['SQLALCHEMY_BINDS']:
+        app.after_request(_remember_write)
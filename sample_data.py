@@ -1,5 +1,6 @@
 from app import db
 from models import LLMResponse
+from ingest import ingest_records
 import logging
 
 def initialize_sample_data():
@@ -54,16 +55,8 @@ def initialize_sample_data():
     ]
     
     try:
-        for response_data in sample_responses:
-            response = LLMResponse(
-                prompt=response_data["prompt"],
-                response=response_data["response"],
-                model_name=response_data["model_name"]
-            )
-            db.session.add(response)
-        
-        db.session.commit()
-        logging.info(f"Successfully initialized {len(sample_responses)} sample LLM responses")
+        report = ingest_records(sample_responses)
+        logging.info(f"Successfully initialized {report['inserted']} sample LLM responses")
         
     except Exception as e:
         logging.error(f"Error initializing sample data: {str(e)}")
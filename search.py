@@ -0,0 +1,255 @@
+import re
+from sqlalchemy import DDL, event, select, insert, delete, func, and_, bindparam, literal_column, table, column
+from sqlalchemy.types import Integer, Text
+from app import db
+from models import LLMResponse, Evaluation
+from blobs import load_texts
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_PAGE = 50  # deeper pages mean ranking ever more matches; refine the query instead
+SEARCH_KINDS = ('responses', 'evaluations')
+RISK_FILTERS = ('high', 'medium', 'low')
+INDEX_BATCH_SIZE = 2000
+
+# Searchable text per indexed table, in ranking weight order
+RESPONSE_FIELDS = ['prompt', 'response']
+EVALUATION_FIELDS = ['evaluator_notes', 'safety_concerns', 'hallucination_flags']
+
+# PostgreSQL text search configuration used for both documents and queries
+TEXT_SEARCH_CONFIG = 'english'
+
+# The index lives in separate tables keyed by the source row id and is
+# written from Python on insert, so it does not depend on where the source
+# text is stored. SQLite uses FTS5; PostgreSQL uses tsvector columns with
+# GIN indexes. Both are created alongside the models by db.create_all().
+for name, fields in (('response_fts', RESPONSE_FIELDS), ('evaluation_fts', EVALUATION_FIELDS)):
+    event.listen(db.metadata, 'after_create', DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} "
+        f"USING fts5({', '.join(fields)}, tokenize='porter unicode61')"
+    ).execute_if(dialect='sqlite'))
+    event.listen(db.metadata, 'before_drop', DDL(f"DROP TABLE IF EXISTS {name}").execute_if(dialect='sqlite'))
+
+for name, source in (('response_search', 'llm_response'), ('evaluation_search', 'evaluation')):
+    event.listen(db.metadata, 'after_create', DDL(
+        f"CREATE TABLE IF NOT EXISTS {name} ("
+        f"id INTEGER PRIMARY KEY REFERENCES {source} (id) ON DELETE CASCADE, "
+        f"document tsvector NOT NULL)"
+    ).execute_if(dialect='postgresql'))
+    event.listen(db.metadata, 'after_create', DDL(
+        f"CREATE INDEX IF NOT EXISTS ix_{name}_document ON {name} USING GIN (document)"
+    ).execute_if(dialect='postgresql'))
+    event.listen(db.metadata, 'before_drop', DDL(f"DROP TABLE IF EXISTS {name}").execute_if(dialect='postgresql'))
+
+_fts_tables = {
+    'responses': table('response_fts', column('rowid'), *(column(f, Text) for f in RESPONSE_FIELDS)),
+    'evaluations': table('evaluation_fts', column('rowid'), *(column(f, Text) for f in EVALUATION_FIELDS)),
+}
+_tsvector_tables = {
+    'responses': table('response_search', column('id'), column('document')),
+    'evaluations': table('evaluation_search', column('id'), column('document')),
+}
+_fields = {'responses': RESPONSE_FIELDS, 'evaluations': EVALUATION_FIELDS}
+
+
+def search_backend():
+    """'sqlite' or 'postgresql' when full-text search is available, else None"""
+    dialect = db.session.get_bind().dialect.name
+    return dialect if dialect in ('sqlite', 'postgresql') else None
+
+
+def _document_expr(fields):
+    """tsvector built from bound text parameters, one weight class per field"""
+    parts = []
+    for f, weight in zip(fields, 'ABCD'):
+        vector = func.to_tsvector(TEXT_SEARCH_CONFIG, func.coalesce(bindparam(f, type_=Text), ''))
+        parts.append(func.setweight(vector, literal_column(f"'{weight}'")))
+    document = parts[0]
+    for part in parts[1:]:
+        document = document.op('||')(part)
+    return document
+
+
+def _index_rows(kind, rows):
+    """Add rows (dicts with 'id' and the kind's text fields) to the search index.
+
+    Rows without any text are skipped. Runs in the caller's transaction.
+    """
+    backend = search_backend()
+    fields = _fields[kind]
+    rows = [{'id': row['id'], **{f: row.get(f) or None for f in fields}}
+            for row in rows if any(row.get(f) for f in fields)]
+    if not rows or backend is None:
+        return
+
+    if backend == 'sqlite':
+        fts = _fts_tables[kind]
+        db.session.execute(insert(fts), [{'rowid': row['id'], **{f: row[f] for f in fields}} for row in rows])
+    else:
+        index = _tsvector_tables[kind]
+        statement = index.insert().values(id=bindparam('id', type_=Integer), document=_document_expr(fields))
+        db.session.execute(statement, rows)
+
+
+def index_responses(rows):
+    """Index new responses: dicts with id, prompt and response"""
+    _index_rows('responses', rows)
+
+
+def index_evaluations(rows):
+    """Index new evaluations: dicts with id and the free-text feedback fields"""
+    _index_rows('evaluations', rows)
+
+
+def rebuild_search_index():
+    """Rebuild both search indexes from the source tables.
+
+    Returns (responses, evaluations) indexed. Does not commit.
+    """
+    backend = search_backend()
+    if backend is None:
+        return 0, 0
+
+    counts = []
+    sources = (('responses', [LLMResponse.id, LLMResponse.prompt_hash, LLMResponse.response_hash]),
+               ('evaluations', [Evaluation.id] + [getattr(Evaluation, f) for f in EVALUATION_FIELDS]))
+    for kind, columns in sources:
+        index = _fts_tables[kind] if backend == 'sqlite' else _tsvector_tables[kind]
+        db.session.execute(delete(index))
+        result = db.session.execute(select(*columns).order_by(columns[0]).execution_options(yield_per=INDEX_BATCH_SIZE))
+        count = 0
+        for batch in result.mappings().partitions():
+            rows = [dict(row) for row in batch]
+            if kind == 'responses':
+                _resolve_texts(rows, cache=False)
+            _index_rows(kind, rows)
+            count += len(batch)
+        counts.append(count)
+
+    if backend == 'sqlite':
+        # Merge the b-tree segments written batch by batch into one
+        for name in ('response_fts', 'evaluation_fts'):
+            db.session.execute(insert(table(name, column(name))).values({name: 'optimize'}))
+    return tuple(counts)
+
+
+def _resolve_texts(rows, cache=True):
+    """Replace prompt_hash/response_hash in response rows with their text"""
+    texts = load_texts([row[f'{f}_hash'] for row in rows for f in RESPONSE_FIELDS], cache=cache)
+    for row in rows:
+        for f in RESPONSE_FIELDS:
+            row[f] = texts[row.pop(f'{f}_hash')]
+
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query matching all of its words.
+
+    Every word is quoted, so operators and punctuation typed by users
+    cannot produce FTS5 syntax errors.
+    """
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def _risk_condition(level):
+    """SQL equivalent of Evaluation.risk_level_for(safety) == level"""
+    if level == 'high':
+        return Evaluation.safety <= 2
+    if level == 'medium':
+        return and_(Evaluation.safety > 2, Evaluation.safety <= 3)
+    return Evaluation.safety > 3
+
+
+def _evaluation_filters(risk, rating_field, min_rating, max_rating):
+    conditions = []
+    if risk in RISK_FILTERS:
+        conditions.append(_risk_condition(risk))
+    rating = getattr(Evaluation, rating_field)
+    if min_rating is not None:
+        conditions.append(rating >= min_rating)
+    if max_rating is not None:
+        conditions.append(rating <= max_rating)
+    return conditions
+
+
+def search(query, kind='responses', model=None, risk=None, rating_field='overall_rating',
+           min_rating=None, max_rating=None, page=1, per_page=DEFAULT_PAGE_SIZE):
+    """Ranked full-text search over responses or evaluator feedback.
+
+    ``responses`` matches prompt and response text; rating and risk filters
+    then keep responses with at least one matching evaluation.
+    ``evaluations`` matches the feedback fields of individual evaluations.
+    Results are ordered by relevance and paginated; ``page`` and
+    ``per_page`` are clamped to 1..MAX_PAGE and 1..MAX_PAGE_SIZE, and the
+    values used are returned. next_page is None on the last page.
+    """
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    page = max(1, min(page, MAX_PAGE))
+    backend = search_backend()
+
+    if backend == 'sqlite':
+        match_text = _fts_query(query)
+        if not match_text:
+            return {'results': [], 'page': page, 'per_page': per_page, 'next_page': None}
+        index = _fts_tables[kind]
+        index_name = index.name
+        index_id = index.c.rowid
+        matches = literal_column(index_name).op('MATCH')(match_text)
+        weights = [1.0 / (position + 1) for position in range(len(_fields[kind]))]
+        # bm25() is lower for better matches
+        rank = func.bm25(literal_column(index_name), *weights)
+        order = rank.asc()
+    else:
+        ts_query = func.plainto_tsquery(TEXT_SEARCH_CONFIG, query)
+        index = _tsvector_tables[kind]
+        index_id = index.c.id
+        matches = index.c.document.bool_op('@@')(ts_query)
+        rank = func.ts_rank_cd(index.c.document, ts_query)
+        order = rank.desc()
+
+    evaluation_filters = _evaluation_filters(risk, rating_field, min_rating, max_rating)
+    if kind == 'responses':
+        statement = select(LLMResponse.id, LLMResponse.model_name, LLMResponse.prompt_hash,
+                           LLMResponse.response_hash, rank.label('rank')) \
+            .join_from(index, LLMResponse, LLMResponse.id == index_id)
+        if evaluation_filters:
+            # Evaluated responses are far fewer than indexed ones, so collect
+            # them once rather than probing the evaluations for every match
+            statement = statement.where(LLMResponse.id.in_(
+                select(Evaluation.response_id).where(*evaluation_filters)
+            ))
+    else:
+        statement = select(Evaluation.id, Evaluation.session_id, Evaluation.response_id,
+                           LLMResponse.model_name, Evaluation.safety, Evaluation.overall_rating,
+                           Evaluation.requires_revision, *(getattr(Evaluation, f) for f in EVALUATION_FIELDS),
+                           rank.label('rank')) \
+            .join_from(index, Evaluation, Evaluation.id == index_id) \
+            .join(LLMResponse, LLMResponse.id == Evaluation.response_id) \
+            .where(*evaluation_filters)
+    if model:
+        statement = statement.where(LLMResponse.model_name == model)
+
+    rows = db.session.execute(
+        statement.where(matches).order_by(order, index_id).limit(per_page + 1).offset((page - 1) * per_page)
+    ).mappings().all()
+    has_more = len(rows) > per_page and page < MAX_PAGE
+    results = [dict(row) for row in rows[:per_page]]
+    if kind == 'responses':
+        _resolve_texts(results)
+
+    return {
+        'results': [_result(kind, row) for row in results],
+        'page': page,
+        'per_page': per_page,
+        'next_page': page + 1 if has_more else None,
+    }
+
+
+def _result(kind, result):
+    result['rank'] = round(abs(result['rank']), 6)
+    if kind == 'responses':
+        result['prompt'] = result['prompt'][:300]
+        result['response'] = result['response'][:300]
+    else:
+        result['risk_level'] = Evaluation.risk_level_for(result['safety'])
+    return result
@@ -0,0 +1,157 @@
+import json
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, func, case, cast, extract, BigInteger
+from app import db
+from models import Evaluation, LLMResponse
+from analytics import distinct_model_names, model_code_expr
+from rollups import RATED_FIELDS
+
+MANIFEST_NAME = 'manifest.json'
+SNAPSHOT_VERSION = 1
+WRITE_BATCH_SIZE = 50000
+
+# Column name -> little-endian dtype; ratings use 0 for a missing value
+SNAPSHOT_COLUMNS = {
+    'id': '<i4',
+    'response_id': '<i4',
+    'session_id': '<i4',
+    'model': '<i2',
+    'created_at': '<i8',  # seconds since the epoch, UTC
+    **{name: '<i1' for name in RATED_FIELDS},
+    'requires_revision': '<i1',
+}
+
+
+def _column_path(directory, name):
+    return os.path.join(directory, f'{name}.bin')
+
+
+def read_manifest(directory):
+    """The snapshot manifest in ``directory``, or None if there is no snapshot"""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')} in {directory}")
+    return manifest
+
+
+def _write_manifest(directory, manifest):
+    # Replace atomically so readers never see a half-written manifest
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _first_unsettled_id(after_id, settled_before):
+    """Lowest id above ``after_id`` of an evaluation too recent to snapshot, or None"""
+    return db.session.execute(
+        select(func.min(Evaluation.id))
+        .where(Evaluation.id > after_id, Evaluation.created_at >= settled_before)
+    ).scalar()
+
+
+def _snapshot_query(model_names, after_id, before_id=None):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        epoch = (func.julianday(Evaluation.created_at) - 2440587.5) * 86400
+    else:
+        epoch = extract('epoch', Evaluation.created_at)
+    seconds = cast(func.round(epoch), BigInteger)
+    query = select(
+        Evaluation.id,
+        Evaluation.response_id,
+        Evaluation.session_id,
+        model_code_expr(model_names),
+        func.coalesce(seconds, 0),
+        *[func.coalesce(getattr(Evaluation, name), 0) for name in RATED_FIELDS],
+        case((Evaluation.requires_revision.is_(True), 1), else_=0),
+    ).join(LLMResponse, LLMResponse.id == Evaluation.response_id) \
+        .where(Evaluation.id > after_id) \
+        .order_by(Evaluation.id)
+    if before_id is not None:
+        query = query.where(Evaluation.id < before_id)
+    return query
+
+
+def write_snapshot(directory, full=False):
+    """Create or refresh a columnar ratings snapshot in ``directory``.
+
+    Each column is a flat binary file of fixed-width integers, described
+    by manifest.json. A refresh appends only evaluations with ids above
+    the previous snapshot's high-water mark; ``full`` rewrites from
+    scratch. Returns the updated manifest.
+
+    Ids are handed out before commit, so a lower id can become visible
+    after a higher one. The refresh stops below the first evaluation
+    younger than SNAPSHOT_SETTLE_SECONDS, so the high-water mark never
+    passes a row whose transaction may still be committing.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = None if full else read_manifest(directory)
+    if manifest is None:
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'rows': 0,
+            'last_evaluation_id': 0,
+            'columns': SNAPSHOT_COLUMNS,
+            'model_names': [],
+        }
+
+    # Model codes are stable across refreshes: new names are appended
+    known = set(manifest['model_names'])
+    manifest['model_names'] += sorted(name for name in distinct_model_names() if name not in known)
+
+    # Drop anything a previously interrupted refresh appended past the manifest
+    files = {}
+    for name, dtype in SNAPSHOT_COLUMNS.items():
+        files[name] = open(_column_path(directory, name), 'r+b' if manifest['rows'] else 'w+b')
+        files[name].truncate(manifest['rows'] * np.dtype(dtype).itemsize)
+        files[name].seek(0, os.SEEK_END)
+
+    rows = manifest['rows']
+    last_id = manifest['last_evaluation_id']
+    settled_before = datetime.utcnow() - timedelta(seconds=current_app.config['SNAPSHOT_SETTLE_SECONDS'])
+    try:
+        query = _snapshot_query(manifest['model_names'], last_id, _first_unsettled_id(last_id, settled_before))
+        result = db.session.execute(query.execution_options(yield_per=WRITE_BATCH_SIZE))
+        for partition in result.partitions():
+            matrix = np.array(partition, dtype=np.int64)
+            for index, (name, dtype) in enumerate(SNAPSHOT_COLUMNS.items()):
+                files[name].write(matrix[:, index].astype(dtype).tobytes())
+            rows += len(matrix)
+            last_id = int(matrix[-1, 0])
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest.update(rows=rows, last_evaluation_id=last_id,
+                    refreshed_at=datetime.utcnow().isoformat())
+    _write_manifest(directory, manifest)
+    return manifest
+
+
+def load_snapshot(directory):
+    """Memory-map a snapshot's columns without copying them into memory.
+
+    Returns the same layout as analytics.load_ratings (plus ``id``,
+    ``created_at`` and ``requires_revision``), so the analytics functions
+    can run directly on a snapshot.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f'No ratings snapshot in {directory}')
+
+    columns = {'model_names': manifest['model_names']}
+    for name, dtype in manifest['columns'].items():
+        if manifest['rows']:
+            columns[name] = np.memmap(_column_path(directory, name), dtype=dtype,
+                                      mode='r', shape=(manifest['rows'],))
+        else:
+            columns[name] = np.zeros(0, dtype=dtype)
+    return columns
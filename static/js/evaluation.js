@@ -416,45 +416,60 @@ function exportSession(sessionId, format = 'json') {
     }, 2000);
 }
 
-// Auto-save functionality for long forms
+// Auto-save functionality for long forms. Drafts are kept per session and
+// response; the ids and CSRF token always come from the server, never a draft.
+const AUTOSAVE_EXCLUDED_FIELDS = ['csrf_token', 'session_id', 'response_id'];
+
+function autoSaveKey(form) {
+    return `autosave_${form.elements.session_id.value}_${form.elements.response_id.value}`;
+}
+
+function restoreAutoSave(form) {
+    const savedData = localStorage.getItem(autoSaveKey(form));
+    if (!savedData) return;
+    try {
+        const data = JSON.parse(savedData);
+        Object.keys(data).forEach(key => {
+            if (AUTOSAVE_EXCLUDED_FIELDS.includes(key)) return;
+            const field = form.elements[key];
+            if (!field) return;
+            if (field.type === 'checkbox') {
+                field.checked = true;
+            } else {
+                field.value = data[key];
+            }
+        });
+    } catch (e) {
+        console.warn('Could not restore auto-saved data:', e);
+    }
+}
+
 function initializeAutoSave() {
     const form = document.querySelector('#evaluationForm');
-    if (!form) return;
-    
-    const formData = new FormData(form);
-    const autoSaveKey = `autosave_${form.dataset.sessionId}_${form.dataset.responseId}`;
-    
-    // Load saved data
-    const savedData = localStorage.getItem(autoSaveKey);
-    if (savedData) {
-        try {
-            const data = JSON.parse(savedData);
-            Object.keys(data).forEach(key => {
-                const field = form.querySelector(`[name="${key}"]`);
-                if (field) {
-                    field.value = data[key];
-                }
-            });
-        } catch (e) {
-            console.warn('Could not restore auto-saved data:', e);
-        }
-    }
+    if (!form || !form.elements.session_id || !form.elements.response_id) return;
+    
+    // Drafts from before they were keyed per response could hold another response's ids
+    localStorage.removeItem('autosave_undefined_undefined');
+    
+    restoreAutoSave(form);
     
-    // Save on change
-    form.addEventListener('input', debounce(function() {
+    // Save on change, under the response being edited when the change happened
+    let pendingSave = null;
+    form.addEventListener('input', function(e) {
+        if (!e.isTrusted) return;
+        const key = autoSaveKey(form);
         const currentData = {};
-        const formData = new FormData(form);
-        
-        for (let [key, value] of formData.entries()) {
-            currentData[key] = value;
+        for (let [name, value] of new FormData(form).entries()) {
+            if (!AUTOSAVE_EXCLUDED_FIELDS.includes(name)) currentData[name] = value;
         }
-        
-        localStorage.setItem(autoSaveKey, JSON.stringify(currentData));
-    }, 1000));
+        clearTimeout(pendingSave);
+        pendingSave = setTimeout(() => localStorage.setItem(key, JSON.stringify(currentData)), 1000);
+    });
     
     // Clear auto-save on successful submit
     form.addEventListener('submit', function() {
-        localStorage.removeItem(autoSaveKey);
+        clearTimeout(pendingSave);
+        localStorage.removeItem(autoSaveKey(form));
     });
 }
 
@@ -594,4 +609,174 @@ function initializeCharacterCounts() {
 document.addEventListener('DOMContentLoaded', function() {
     initializeAutoSave();
     initializeCharacterCounts();
+    initializeEvaluationFlow();
 });
+
+// Prefetching evaluation flow: keeps the next few responses leased and
+// loaded, submits in the background and swaps the page content in place.
+const PREFETCH_COUNT = 3;
+const SUBMIT_RETRIES = 4;
+const RETRY_BASE_DELAY = 1000;
+const EVALUATION_ID_FIELDS = ['session_id', 'response_id'];
+const EVALUATION_RATING_FIELDS = ['helpfulness', 'correctness', 'coherence', 'empathy_tone', 'safety', 'overall_rating'];
+const EVALUATION_TEXT_FIELDS = ['evaluator_notes', 'improvement_suggestions', 'safety_concerns', 'hallucination_flags'];
+
+function initializeEvaluationFlow() {
+    const form = document.querySelector('#evaluationForm[data-next-url]');
+    if (!form || !window.fetch) return;
+    
+    const flow = {
+        form: form,
+        current: parseInt(form.elements.response_id.value),
+        queue: [],
+        seen: new Set(),
+        pending: new Set(),
+        fetching: null,
+        exhausted: false
+    };
+    flow.seen.add(flow.current);
+    
+    form.addEventListener('submit', function(e) {
+        if (e.defaultPrevented) return;
+        e.preventDefault();
+        if (!validateForm(form)) return;
+        submitCurrent(flow);
+    });
+    
+    prefetchResponses(flow);
+}
+
+function prefetchResponses(flow) {
+    if (flow.fetching || flow.exhausted || flow.queue.length >= PREFETCH_COUNT) {
+        return flow.fetching || Promise.resolve();
+    }
+    
+    // Leases already held come back first, so ask for those plus the lookahead
+    const held = 1 + flow.queue.length + flow.pending.size;
+    const url = `${flow.form.dataset.nextUrl}?count=${held + PREFETCH_COUNT}`;
+    
+    flow.fetching = fetch(url, {headers: {'Accept': 'application/json'}})
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(data => {
+            const fresh = data.items.filter(item => !flow.seen.has(item.id));
+            fresh.forEach(item => {
+                flow.seen.add(item.id);
+                flow.queue.push(item);
+            });
+            flow.exhausted = fresh.length === 0;
+        })
+        .catch(error => {
+            console.warn('Could not prefetch responses:', error);
+        })
+        .finally(() => {
+            flow.fetching = null;
+        });
+    return flow.fetching;
+}
+
+function collectEvaluation(form) {
+    const evaluation = {};
+    const elements = form.elements;
+    EVALUATION_ID_FIELDS.concat(EVALUATION_RATING_FIELDS).forEach(name => {
+        if (elements[name]) evaluation[name] = parseInt(elements[name].value);
+    });
+    EVALUATION_TEXT_FIELDS.forEach(name => {
+        if (elements[name]) evaluation[name] = elements[name].value || null;
+    });
+    if (elements.requires_revision) evaluation.requires_revision = elements.requires_revision.checked;
+    return evaluation;
+}
+
+function submitCurrent(flow) {
+    const evaluation = collectEvaluation(flow.form);
+    flow.pending.add(evaluation.response_id);
+    
+    postEvaluation(flow, evaluation, 0).finally(() => {
+        flow.pending.delete(evaluation.response_id);
+        if (flow.done) finishFlow(flow);
+    });
+    
+    showNextResponse(flow);
+}
+
+function postEvaluation(flow, evaluation, attempt) {
+    return fetch(flow.form.dataset.submitUrl, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json', 'Accept': 'application/json'},
+        body: JSON.stringify([evaluation])
+    })
+        .then(response => response.json().then(data => ({status: response.status, data: data})))
+        .then(({status, data}) => {
+            if (status >= 500 || status === 409) throw new Error(`HTTP ${status}`);
+            const errors = (data.errors || []).flatMap(error => Object.entries(error.errors));
+            // An earlier attempt that timed out on our side may already have been stored
+            const onlyDuplicate = errors.length === 1 && errors[0][0] === 'response_id';
+            if (errors.length && !(attempt > 0 && onlyDuplicate)) {
+                const message = errors.map(([field, messages]) => `${field}: ${messages.join(' ')}`).join('; ');
+                showToast(`Evaluation of response #${evaluation.response_id} was not saved: ${message}`, 'danger');
+            }
+        })
+        .catch(error => {
+            if (attempt >= SUBMIT_RETRIES) {
+                showToast(`Evaluation of response #${evaluation.response_id} could not be sent (${error.message}). Your lease is kept; reload to retry.`, 'danger');
+                return;
+            }
+            const delay = RETRY_BASE_DELAY * Math.pow(2, attempt);
+            return new Promise(resolve => setTimeout(resolve, delay))
+                .then(() => postEvaluation(flow, evaluation, attempt + 1));
+        });
+}
+
+function showNextResponse(flow) {
+    const next = flow.queue.shift();
+    if (!next) {
+        // Nothing prefetched yet: wait for the lookahead, then decide
+        showLoadingState(flow.form.querySelector('.submit-btn'));
+        const waiting = flow.fetching || prefetchResponses(flow);
+        waiting.then(() => {
+            hideLoadingState(flow.form.querySelector('.submit-btn'));
+            if (flow.queue.length) {
+                showNextResponse(flow);
+            } else {
+                flow.done = true;
+                finishFlow(flow);
+            }
+        });
+        return;
+    }
+    
+    flow.current = next.id;
+    document.querySelector('[data-response-field="model_name"]').textContent = next.model_name;
+    document.querySelector('[data-response-field="prompt"]').textContent = next.prompt;
+    const responseText = document.querySelector('[data-response-field="response"]');
+    responseText.textContent = '';
+    next.response.split('\n').forEach((line, index) => {
+        if (index > 0) responseText.appendChild(document.createElement('br'));
+        responseText.appendChild(document.createTextNode(line));
+    });
+    
+    flow.form.dataset.swapping = '1';
+    flow.form.reset();
+    flow.form.elements.response_id.value = next.id;
+    restoreAutoSave(flow.form);
+    setTimeout(() => {
+        delete flow.form.dataset.swapping;
+        flow.form.querySelectorAll('.rating-select').forEach(select => select.classList.remove('text-danger', 'text-warning', 'text-success'));
+        flow.form.querySelectorAll('.feedback-textarea').forEach(textarea => textarea.dispatchEvent(new Event('input')));
+        updateAverageRating();
+    }, 100);
+    window.scrollTo({top: 0, behavior: 'smooth'});
+    
+    prefetchResponses(flow);
+}
+
+function finishFlow(flow) {
+    // Once every background submission has settled, reload the page and let
+    // the server pick up from there (or send us to the session summary)
+    if (flow.pending.size === 0) {
+        window.location.reload();
+    }
+}
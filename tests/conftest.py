@@ -0,0 +1,54 @@
+import pytest
+
+from app import create_app, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The app on a fresh SQLite database, with an app context pushed for the test"""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SQLALCHEMY_BINDS': {},
+        'REPLICA_DATABASE_URL': None,
+        'WTF_CSRF_ENABLED': False,
+        'JOB_WORKERS': 0,
+        'JOB_RESULTS_DIR': str(tmp_path / 'job_results'),
+        'SNAPSHOT_DIR': str(tmp_path / 'snapshot'),
+    })
+    with app.app_context():
+        # The db object is shared by every app the tests build, so only create the default bind
+        db.create_all(bind_key=None)
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def responses(app):
+    """Six distinct responses from one model, ingested (and queued for rating) the normal way"""
+    from ingest import ingest_records
+    from models import LLMResponse
+    ingest_records([{'prompt': f'Question {i}: what is {i} squared?',
+                     'response': f'The square of {i} is {i * i}, since {i} times {i} is {i * i}.',
+                     'model_name': 'model-a'} for i in range(6)])
+    return LLMResponse.query.order_by(LLMResponse.id).all()
+
+
+@pytest.fixture
+def make_session(app):
+    """Factory for in-progress evaluation sessions, created with their empty rollup like start_session"""
+    from models import EvaluationSession, SessionStats
+
+    def make(name='Reviewer', rollup=True):
+        session = EvaluationSession(evaluator_name=name)
+        db.session.add(session)
+        db.session.flush()
+        if rollup:
+            db.session.add(SessionStats(session_id=session.id))
+        db.session.commit()
+        return session
+    return make
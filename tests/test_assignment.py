@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+from app import db
+from assignment import claim_many, claim_next, complete_assignments, enqueue_responses, held_leases
+from models import Evaluation, WorkItem
+
+
+def _items(**filters):
+    return WorkItem.query.filter_by(**filters).order_by(WorkItem.id).all()
+
+
+def test_enqueue_tops_up_to_the_target(app, responses, make_session):
+    target = app.config['RATINGS_PER_RESPONSE']
+    assert len(_items()) == len(responses) * target
+    assert enqueue_responses() == 0
+
+    session = make_session()
+    db.session.add(Evaluation(session_id=session.id, response_id=responses[0].id))
+    db.session.delete(_items(response_id=responses[0].id)[0])
+    db.session.commit()
+    assert enqueue_responses() == 0
+
+    db.session.delete(_items(response_id=responses[1].id)[0])
+    db.session.commit()
+    assert enqueue_responses([responses[1].id]) == 1
+
+
+def test_sessions_never_share_a_slot(app, responses, make_session):
+    first, second = make_session('First'), make_session('Second')
+
+    claimed_first = claim_many(first.id, 4)
+    claimed_second = claim_many(second.id, 4)
+
+    assert len(claimed_first) == len(set(claimed_first)) == 4
+    assert len(claimed_second) == len(set(claimed_second)) == 4
+    first_items = {item.id for item in held_leases(first.id)}
+    second_items = {item.id for item in held_leases(second.id)}
+    assert len(first_items) == len(second_items) == 4
+    assert not first_items & second_items
+
+
+def test_held_leases_are_returned_again_and_renewed(app, responses, make_session):
+    session = make_session()
+    claimed = claim_many(session.id, 3)
+    item = held_leases(session.id)[0]
+    item.leased_until = datetime.utcnow() + timedelta(seconds=5)
+    db.session.commit()
+
+    assert claim_many(session.id, 3) == claimed
+    assert claim_next(session.id) == claimed[0]
+    assert db.session.get(WorkItem, item.id).leased_until > datetime.utcnow() + timedelta(seconds=60)
+    assert len(held_leases(session.id)) == 3
+
+
+def test_rated_responses_are_skipped(app, responses, make_session):
+    session = make_session()
+    db.session.add_all([Evaluation(session_id=session.id, response_id=r.id) for r in responses[:5]])
+    db.session.commit()
+
+    assert claim_many(session.id, 3) == [responses[5].id]
+
+
+def test_expired_lease_can_be_claimed_again(app, responses, make_session):
+    app.config['RATINGS_PER_RESPONSE'] = 1
+    WorkItem.query.delete()
+    enqueue_responses()
+    db.session.commit()
+    first, second = make_session('First'), make_session('Second')
+
+    claimed = claim_many(first.id, len(responses))
+    assert sorted(claimed) == [r.id for r in responses]
+    assert claim_many(second.id, 1) == []
+
+    for item in held_leases(first.id):
+        item.leased_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+    assert claim_many(second.id, 2) == claimed[:2]
+    assert held_leases(first.id) == []
+
+
+def test_completion_retires_the_held_item_first(app, responses, make_session):
+    session, other = make_session(), make_session('Other')
+    response_id = responses[0].id
+    free, held, leased_elsewhere = _items(response_id=response_id)
+    held.session_id, held.leased_until = session.id, datetime.utcnow() + timedelta(minutes=5)
+    leased_elsewhere.session_id, leased_elsewhere.leased_until = other.id, datetime.utcnow() + timedelta(minutes=5)
+    db.session.commit()
+
+    complete_assignments([(session.id, response_id)])
+    db.session.commit()
+    assert [item.id for item in _items(response_id=response_id)] == [free.id, leased_elsewhere.id]
+
+    # Without a lease of its own, a submit retires a free slot, never another session's
+    complete_assignments([(session.id, response_id)])
+    db.session.commit()
+    assert [item.id for item in _items(response_id=response_id)] == [leased_elsewhere.id]
+
+
+def test_no_claims_for_a_session_that_is_not_in_progress(app, responses, make_session):
+    session = make_session()
+    session.status = 'completed'
+    db.session.commit()
+
+    assert claim_many(session.id, 3) == []
+    assert claim_next(session.id) is None
+    assert _items(session_id=session.id) == []
@@ -0,0 +1,125 @@
+import batch
+from app import db
+from models import Evaluation, SessionStats, WorkItem
+
+RATINGS = dict(helpfulness=4, correctness=5, coherence=4, empathy_tone=3, safety=2, overall_rating=4)
+
+
+def _item(session, response, **overrides):
+    return dict(RATINGS, session_id=session.id, response_id=response.id, **overrides)
+
+
+def _post(client, items, atomic=False):
+    url = '/api/evaluations/batch' + ('?atomic=1' if atomic else '')
+    return client.post(url, json={'evaluations': items})
+
+
+def test_valid_batch_updates_rollup_and_work_queue(client, responses, make_session):
+    session = make_session()
+    items_before = WorkItem.query.filter(WorkItem.response_id.in_([responses[0].id, responses[1].id])).count()
+
+    response = _post(client, [_item(session, responses[0], requires_revision=True),
+                              _item(session, responses[1], safety=5, evaluator_notes='Clear and correct.')])
+
+    assert response.status_code == 201
+    result = response.get_json()
+    assert result['inserted'] == 2 and result['errors'] == []
+    assert [e.response_id for e in Evaluation.query.filter(Evaluation.id.in_(result['ids']))] == \
+        [responses[0].id, responses[1].id]
+
+    db.session.expire_all()
+    stats = db.session.get(SessionStats, session.id)
+    assert stats.evaluation_count == 2
+    assert stats.helpfulness_sum == 8 and stats.helpfulness_count == 2
+    assert (stats.risk_high, stats.risk_low) == (1, 1)
+    assert stats.revision_count == 1
+    assert WorkItem.query.filter(WorkItem.response_id.in_([responses[0].id, responses[1].id])).count() == \
+        items_before - 2
+
+
+def test_invalid_items_are_reported_by_index(client, responses, make_session):
+    session = make_session()
+
+    response = _post(client, [
+        _item(session, responses[0]),
+        _item(session, responses[1], helpfulness=9),
+        dict(_item(session, responses[2]), correctness=None),
+        _item(session, responses[3], evaluator_notes='x' * 2001),
+        _item(session, responses[4], colour='blue'),
+        'not an object',
+        dict(_item(session, responses[5]), session_id=9999),
+    ])
+
+    assert response.status_code == 201
+    result = response.get_json()
+    assert result['inserted'] == 1
+    errors = {error['index']: error['errors'] for error in result['errors']}
+    assert errors[1] == {'helpfulness': ['Not a valid choice.']}
+    assert errors[2] == {'correctness': ['This field is required.']}
+    assert 'evaluator_notes' in errors[3]
+    assert 'item' in errors[4] and 'item' in errors[5]
+    assert errors[6] == {'session_id': ['Unknown session.']}
+    assert db.session.get(SessionStats, session.id).evaluation_count == 1
+
+
+def test_duplicates_within_the_batch_and_against_stored_evaluations(client, responses, make_session):
+    session = make_session()
+    assert _post(client, [_item(session, responses[0])]).status_code == 201
+
+    response = _post(client, [_item(session, responses[0]), _item(session, responses[1]),
+                              _item(session, responses[1])])
+
+    result = response.get_json()
+    assert response.status_code == 201
+    assert result['inserted'] == 1
+    assert [error['index'] for error in result['errors']] == [0, 2]
+    assert all(error['errors']['response_id'] == ['Already evaluated in this session.']
+               for error in result['errors'])
+    assert Evaluation.query.filter_by(session_id=session.id).count() == 2
+    db.session.expire_all()
+    assert db.session.get(SessionStats, session.id).evaluation_count == 2
+
+
+def test_nothing_valid_stores_nothing(client, responses, make_session):
+    session = make_session()
+
+    response = _post(client, [_item(session, responses[0], safety=0)])
+
+    assert response.status_code == 200
+    assert response.get_json()['inserted'] == 0
+    assert Evaluation.query.count() == 0
+
+
+def test_atomic_batch_with_an_error_is_rejected(client, responses, make_session):
+    session = make_session()
+    work_items = WorkItem.query.count()
+
+    response = _post(client, [_item(session, responses[0]), _item(session, responses[1], overall_rating=7)],
+                     atomic=True)
+
+    assert response.status_code == 422
+    assert response.get_json()['inserted'] == 0
+    assert Evaluation.query.count() == 0
+    assert db.session.get(SessionStats, session.id).evaluation_count == 0
+    assert WorkItem.query.count() == work_items
+
+
+def test_concurrent_duplicate_is_a_conflict(client, responses, make_session, monkeypatch):
+    session = make_session()
+    assert _post(client, [_item(session, responses[0])]).status_code == 201
+    # Validation misses the stored pair, as if another request committed it meanwhile
+    pair_rows = batch._pair_rows
+    monkeypatch.setattr(batch, '_pair_rows', lambda rows, *columns: pair_rows(rows, *columns) if columns else [])
+
+    response = _post(client, [_item(session, responses[0]), _item(session, responses[1])])
+
+    assert response.status_code == 409
+    assert Evaluation.query.filter_by(session_id=session.id).count() == 1
+    db.session.expire_all()
+    assert db.session.get(SessionStats, session.id).evaluation_count == 1
+
+
+def test_malformed_and_oversized_payloads(client):
+    assert client.post('/api/evaluations/batch', json={'items': []}).status_code == 400
+    assert client.post('/api/evaluations/batch', data='not json').status_code == 400
+    assert client.post('/api/evaluations/batch', json=[{}] * (batch.MAX_BATCH_SIZE + 1)).status_code == 413
@@ -0,0 +1,43 @@
+import re
+from html import unescape
+
+from app import db
+from models import EvaluationSession
+
+
+def _older_link(html):
+    match = re.search(r'href="([^"]*cursor=[^"]*)"', html)
+    return unescape(match.group(1)) if match else None
+
+
+def _session_links(html):
+    return set(re.findall(r'/session/(\d+)"', html))
+
+
+def test_older_pages_keep_the_page_size_and_status(client, make_session):
+    sessions = [make_session(f'Reviewer {i}') for i in range(6)]
+    sessions[0].status = 'completed'
+    db.session.commit()
+
+    first = client.get('/dashboard?status=in_progress&per_page=2').get_data(as_text=True)
+    link = _older_link(first)
+    assert 'per_page=2' in link and 'status=in_progress' in link
+
+    second = client.get(link).get_data(as_text=True)
+    third = client.get(_older_link(second)).get_data(as_text=True)
+
+    pages = [_session_links(page) for page in (first, second, third)]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert set().union(*pages) == {str(session.id) for session in sessions[1:]}
+    assert _older_link(third) is None
+    assert 'per_page=2' in re.search(r'href="([^"]*)"[^>]*>\s*<i data-feather="chevrons-left"', third).group(1)
+
+
+def test_default_links_stay_clean(client, make_session):
+    for i in range(3):
+        make_session(f'Reviewer {i}')
+
+    html = client.get('/dashboard').get_data(as_text=True)
+
+    assert 'per_page' not in html
+    assert EvaluationSession.query.count() == 3
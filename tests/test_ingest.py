@@ -0,0 +1,33 @@
+import json
+
+from models import LLMResponse
+
+
+def _jsonl(*records):
+    return b''.join(json.dumps(record).encode('utf-8') + b'\n' for record in records)
+
+
+def test_upload_counts_malformed_lines(client):
+    body = (_jsonl({'prompt': 'What is 2 + 2?', 'response': 'Four.', 'model_name': 'model-a'})
+            + b'{"prompt": "broken\n'
+            + b'\n'
+            + b'{"prompt": "caf\xe9", "response": "not UTF-8"}\n'
+            + _jsonl({'prompt': 'Capital of France?', 'response': 'Paris.', 'model_name': 'model-a'}))
+
+    response = client.post('/api/responses/upload', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['inserted'], report['invalid']) == (2, 2)
+    assert LLMResponse.query.count() == 2
+
+
+def test_upload_skips_duplicates(client):
+    record = {'prompt': 'What is 2 + 2?', 'response': 'Four.', 'model_name': 'model-a'}
+    client.post('/api/responses/upload', data=_jsonl(record), content_type='application/x-ndjson')
+
+    report = client.post('/api/responses/upload', data=_jsonl(record, record),
+                         content_type='application/x-ndjson').get_json()
+
+    assert (report['inserted'], report['duplicates']) == (0, 2)
+    assert LLMResponse.query.count() == 1
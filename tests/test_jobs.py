@@ -0,0 +1,126 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from jobs import MAX_ATTEMPTS, JobRunner, expire_jobs
+from models import Job
+
+
+class InlineExecutor:
+    """Runs submitted jobs immediately, so a dispatch pass finishes them"""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture
+def runner(app):
+    runner = JobRunner(app, max_workers=2)
+    runner._executor = InlineExecutor()
+    return runner
+
+
+def _job(**values):
+    job = Job(kind='export', params=json.dumps({'session_id': 1, 'format': 'json'}), **values)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def _abandon(job):
+    """Leave a job as a dead worker would: running, with a lapsed lease"""
+    job.status, job.worker = 'running', 'dead-host:1'
+    job.leased_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_queued_job_is_claimed_and_run(app, runner, make_session):
+    make_session()
+    job = _job(status='queued')
+
+    runner.dispatch()
+
+    db.session.expire_all()
+    job = db.session.get(Job, job.id)
+    assert (job.status, job.attempts, job.worker) == ('succeeded', 1, None)
+    assert os.path.exists(job.result_path)
+
+
+def test_a_claimed_job_is_not_claimed_again(app, runner):
+    job = _job(status='queued')
+    other = JobRunner(app, max_workers=1)
+    other._executor = InlineExecutor()
+    other._run = lambda job_id: None  # holds the job without finishing it
+    other.dispatch()
+
+    runner.dispatch()
+
+    db.session.expire_all()
+    assert db.session.get(Job, job.id).worker == other.name
+    assert db.session.get(Job, job.id).attempts == 1
+
+
+def test_abandoned_job_is_retried_then_failed(app, runner, make_session, monkeypatch):
+    make_session()
+    job = _job(status='queued')
+    # Every run dies with its worker: the job stays running with a lease that lapses
+    monkeypatch.setattr(runner, '_run', lambda job_id: None)
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        runner.dispatch()
+        db.session.expire_all()
+        job = db.session.get(Job, job.id)
+        assert (job.status, job.attempts) == ('running', attempt)
+        _abandon(job)
+
+    runner.dispatch()
+
+    db.session.expire_all()
+    job = db.session.get(Job, job.id)
+    assert job.status == 'failed'
+    assert job.attempts == MAX_ATTEMPTS
+    assert 'stopped before it finished' in job.error
+
+
+def test_leases_of_running_jobs_are_renewed(app, runner, monkeypatch):
+    job = _job(status='queued')
+    monkeypatch.setattr(runner, '_run', lambda job_id: None)
+    runner.dispatch()
+    runner._running.add(job.id)  # still running: the stubbed run returned without finishing it
+    job.leased_until = datetime.utcnow() + timedelta(seconds=1)
+    db.session.commit()
+
+    runner._next_renewal = 0
+    runner.dispatch()
+
+    db.session.expire_all()
+    assert db.session.get(Job, job.id).leased_until > datetime.utcnow() + timedelta(seconds=30)
+
+
+def test_expire_jobs_deletes_old_finished_jobs_and_files(app, tmp_path):
+    old = datetime.utcnow() - timedelta(days=30)
+    path = tmp_path / 'job-1-export.json'
+    path.write_text('{}')
+    expired = _job(status='succeeded', finished_at=old, result_path=str(path))
+    failed = _job(status='failed', finished_at=old)
+    missing_file = _job(status='succeeded', finished_at=old, result_path=str(tmp_path / 'gone.json'))
+    recent = _job(status='succeeded', finished_at=datetime.utcnow())
+    running = _job(status='running', started_at=old)
+    kept = {recent.id, running.id}
+
+    assert expire_jobs(datetime.utcnow() - timedelta(days=7)) == 3
+
+    assert not path.exists()
+    assert {job.id for job in Job.query} == kept
+
+
+def test_dispatch_expires_jobs_past_retention(app, runner):
+    app.config['JOB_RETENTION_DAYS'] = 1
+    job_id = _job(status='succeeded', finished_at=datetime.utcnow() - timedelta(days=2)).id
+
+    runner.dispatch()
+
+    assert Job.query.filter_by(id=job_id).count() == 0
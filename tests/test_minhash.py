@@ -0,0 +1,74 @@
+import numpy as np
+
+import minhash
+from app import db
+from ingest import ingest_records
+from minhash import dedupe_existing, retire_duplicate_work, signature, signatures
+from models import LLMResponse, SignatureBand, WorkItem
+
+PROMPT = 'Explain how vaccines train the immune system to recognise a pathogen.'
+ANSWER = ('Vaccines expose the immune system to a harmless piece or weakened form of a pathogen. '
+          'B cells learn to make antibodies that bind it, T cells learn to recognise infected cells, '
+          'and memory cells persist for years, so a later real infection is met by a fast and strong '
+          'response before the pathogen can spread and cause serious illness in the body.')
+
+
+def _ingest(*records):
+    ingest_records([{'prompt': prompt, 'response': response, 'model_name': model}
+                    for prompt, response, model in records])
+    return LLMResponse.query.order_by(LLMResponse.id).all()
+
+
+def test_near_duplicates_join_one_cluster_per_model(app):
+    original, reworded, other_model, unrelated = _ingest(
+        (PROMPT, ANSWER, 'model-a'),
+        (PROMPT, ANSWER.replace('serious illness', 'severe illness'), 'model-a'),
+        (PROMPT, ANSWER, 'model-b'),
+        ('What is the capital of France?', 'Paris is the capital and largest city of France.', 'model-a'),
+    )
+
+    assert original.duplicate_of is None
+    assert reworded.duplicate_of == original.id
+    assert other_model.duplicate_of is None
+    assert unrelated.duplicate_of is None
+    banded = set(db.session.execute(db.select(SignatureBand.response_id)).scalars())
+    assert banded == {original.id, other_model.id, unrelated.id}
+    # Only representatives are queued for rating
+    assert {item.response_id for item in WorkItem.query} == banded
+
+
+def test_texts_without_words_are_never_clustered(app):
+    responses = _ingest(('???', '...', 'model-a'), ('!!!', '..', 'model-a'), ('?', '--', 'model-a'))
+
+    assert signature('???', '...') is None
+    assert [response.duplicate_of for response in responses] == [None, None, None]
+    assert retire_duplicate_work() == 0
+    assert {item.response_id for item in WorkItem.query} == {response.id for response in responses}
+    assert db.session.query(SignatureBand).count() == 0
+
+
+def test_dedupe_existing_signs_texts_without_words_once(app):
+    responses = _ingest(('???', '...', 'model-a'), (PROMPT, ANSWER, 'model-a'))
+    db.session.execute(db.delete(minhash.ResponseSignature))
+    db.session.execute(db.delete(SignatureBand))
+    db.session.commit()
+
+    assert dedupe_existing() == (2, 0, 0)
+    assert dedupe_existing() == (0, 0, 0)
+    assert [response.duplicate_of for response in responses] == [None, None]
+
+
+def test_chunked_signatures_match_single_signatures(monkeypatch):
+    rows = [(f'{PROMPT} variant {i}', ANSWER[:40 * (i + 1)]) for i in range(6)] + [('??', '!!'), (PROMPT, ANSWER)]
+    monkeypatch.setattr(minhash, 'SIGN_CHUNK_SHINGLES', 25)
+
+    chunked = signatures(rows)
+
+    assert len(chunked) == len(rows)
+    for (prompt, response), sig in zip(rows, chunked):
+        expected = signature(prompt, response)
+        if expected is None:
+            assert sig is None
+        else:
+            assert np.array_equal(sig, expected)
+
@@ -0,0 +1,89 @@
+from sqlalchemy import event
+
+from app import db
+from models import Evaluation, SessionStats
+from rollups import apply_evaluations, backfill_session_stats, get_session_stats, rebuild_session_stats
+
+
+def _evaluate(session, response, **ratings):
+    values = dict(session_id=session.id, response_id=response.id, **ratings)
+    db.session.add(Evaluation(**values))
+    db.session.flush()
+    apply_evaluations([values])
+    db.session.commit()
+
+
+def _columns(stats):
+    return {column.name: getattr(stats, column.name) for column in SessionStats.__table__.columns
+            if column.name != 'updated_at'}
+
+
+def test_increments_match_a_rebuild(app, responses, make_session):
+    session = make_session()
+    _evaluate(session, responses[0], helpfulness=5, safety=1, overall_rating=4, requires_revision=True)
+    _evaluate(session, responses[1], helpfulness=3, safety=4)
+    _evaluate(session, responses[2])
+
+    incremental = _columns(db.session.get(SessionStats, session.id))
+    rebuild_session_stats([session.id])
+    db.session.commit()
+    db.session.expire_all()
+
+    assert incremental == _columns(db.session.get(SessionStats, session.id))
+    assert incremental['evaluation_count'] == 3
+    assert (incremental['risk_high'], incremental['risk_low'], incremental['risk_unknown']) == (1, 1, 1)
+
+
+def test_session_without_rollup_is_computed_on_read_without_writing(app, responses, make_session):
+    session = make_session(rollup=False)
+    db.session.add_all([Evaluation(session_id=session.id, response_id=r.id, helpfulness=4) for r in responses[:2]])
+    db.session.commit()
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement.split()[0]))
+    stats = get_session_stats(session.id)
+
+    assert stats.evaluation_count == 2
+    assert stats.helpfulness_sum == 8
+    assert set(statements) == {'SELECT'}
+    assert stats not in db.session
+
+
+def test_first_submit_backfills_a_missing_rollup(app, responses, make_session):
+    session = make_session(rollup=False)
+    db.session.add(Evaluation(session_id=session.id, response_id=responses[0].id, helpfulness=2))
+    db.session.commit()
+
+    _evaluate(session, responses[1], helpfulness=5)
+
+    stats = db.session.get(SessionStats, session.id)
+    assert stats.evaluation_count == 2
+    assert stats.helpfulness_sum == 7
+
+
+def test_backfill_only_writes_missing_rollups(app, responses, make_session):
+    with_rollup = make_session()
+    _evaluate(with_rollup, responses[0], helpfulness=5)
+    without = make_session(rollup=False)
+    empty = make_session(rollup=False)
+    db.session.add(Evaluation(session_id=without.id, response_id=responses[0].id, helpfulness=3))
+    db.session.commit()
+
+    assert backfill_session_stats() == 2
+    db.session.commit()
+    assert backfill_session_stats() == 0
+    assert db.session.get(SessionStats, without.id).helpfulness_sum == 3
+    assert db.session.get(SessionStats, empty.id).evaluation_count == 0
+    assert db.session.get(SessionStats, with_rollup.id).helpfulness_sum == 5
+
+
+def test_stats_api_for_a_session_without_rollup(client, responses, make_session):
+    session = make_session(rollup=False)
+    db.session.add(Evaluation(session_id=session.id, response_id=responses[0].id, helpfulness=4, safety=2))
+    db.session.commit()
+
+    data = client.get(f'/api/session_stats/{session.id}').get_json()
+
+    assert data['total_evaluations'] == 1
+    assert data['risk_distribution']['high'] == 1
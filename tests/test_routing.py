@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db
+from routing import LAST_WRITE_KEY, REPLICA_BIND
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'SQLALCHEMY_BINDS': {REPLICA_BIND: f"sqlite:///{tmp_path / 'replica.db'}"},
+        'REPLICA_DATABASE_URL': None,
+        'WTF_CSRF_ENABLED': False,
+        'JOB_WORKERS': 0,
+    })
+    with app.app_context():
+        db.create_all(bind_key=None)
+        # The models have no bind key, so the replica's copy of the schema is made by hand
+        db.metadata.create_all(db.engines[REPLICA_BIND])
+    return app
+
+
+@pytest.fixture
+def statements(app):
+    """Statement keywords run on each database, by 'primary' and 'replica'"""
+    seen = {'primary': [], 'replica': []}
+    with app.app_context():
+        for name, engine in (('primary', db.engines[None]), ('replica', db.engines[REPLICA_BIND])):
+            event.listen(engine, 'before_cursor_execute',
+                         lambda conn, cursor, statement, *args, name=name: seen[name].append(statement.split()[0]))
+    return seen
+
+
+def test_read_only_get_uses_replica(app, statements):
+    response = app.test_client().get('/api/session_stats/1')
+
+    assert response.status_code == 200
+    assert statements['replica']
+    assert statements['primary'] == []
+
+
+def test_post_uses_primary(app, statements):
+    client = app.test_client()
+    response = client.post('/start_session', data={'evaluator_name': 'Reviewer'})
+
+    assert response.status_code == 302
+    assert 'INSERT' in statements['primary']
+    assert statements['replica'] == []
+    with client.session_transaction() as session:
+        assert session[LAST_WRITE_KEY] <= time.time()
+
+
+def test_reads_after_a_write_use_primary(app, statements):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session[LAST_WRITE_KEY] = time.time()
+
+    response = client.get('/api/session_stats/1')
+
+    assert response.status_code == 200
+    assert statements['primary']
+    assert statements['replica'] == []
+
+
+def test_reads_use_replica_once_the_lag_has_passed(app, statements):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session[LAST_WRITE_KEY] = time.time() - app.config['REPLICA_LAG_SECONDS'] - 1
+
+    client.get('/api/session_stats/1')
+
+    assert statements['replica']
+    assert statements['primary'] == []
@@ -0,0 +1,37 @@
+import pytest
+
+import search
+from search import MAX_PAGE, MAX_PAGE_SIZE
+
+
+def test_search_reports_the_page_it_served(client, responses):
+    data = client.get('/api/search?q=square&per_page=2&page=2').get_json()
+
+    assert (data['page'], data['per_page']) == (2, 2)
+    assert len(data['results']) == 2
+    assert data['next_page'] == 3
+
+
+def test_per_page_is_clamped_and_reported(client, responses):
+    data = client.get(f'/api/search?q=square&per_page={MAX_PAGE_SIZE + 50}').get_json()
+
+    assert data['per_page'] == MAX_PAGE_SIZE
+    assert len(data['results']) == len(responses)
+    assert data['next_page'] is None
+
+
+@pytest.mark.parametrize('page', [0, MAX_PAGE + 1, 80])
+def test_pages_past_the_limit_are_rejected(client, responses, page):
+    response = client.get(f'/api/search?q=square&page={page}')
+
+    assert response.status_code == 400
+    assert str(MAX_PAGE) in response.get_json()['error']
+
+
+def test_last_allowed_page_has_no_next_page(client, responses, monkeypatch):
+    monkeypatch.setattr(search, 'MAX_PAGE', 2)
+
+    data = search.search('square', per_page=2, page=2)
+
+    assert data['page'] == 2
+    assert data['next_page'] is None
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from app import db
+from ingest import ingest_records
+from models import Evaluation, EvaluationSession, LLMResponse
+from snapshot import load_snapshot, write_snapshot
+
+
+def _rate(session, count, minutes_ago=10):
+    created_at = datetime.utcnow() - timedelta(minutes=minutes_ago)
+    rated = {row.response_id for row in Evaluation.query.filter_by(session_id=session.id)}
+    responses = [r for r in LLMResponse.query.order_by(LLMResponse.id) if r.id not in rated][:count]
+    evaluations = [Evaluation(session_id=session.id, response_id=r.id, helpfulness=4, overall_rating=3,
+                              created_at=created_at) for r in responses]
+    db.session.add_all(evaluations)
+    db.session.commit()
+    return evaluations
+
+
+def _setup(responses=6):
+    ingest_records([{'prompt': f'Question {i}?', 'response': f'Answer number {i}.', 'model_name': 'model-a'}
+                    for i in range(responses)])
+    session = EvaluationSession(evaluator_name='Reviewer')
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def test_refresh_appends_new_evaluations(app):
+    directory = app.config['SNAPSHOT_DIR']
+    session = _setup()
+    first = _rate(session, 2)
+    assert write_snapshot(directory)['rows'] == 2
+
+    second = _rate(session, 3)
+    manifest = write_snapshot(directory)
+
+    assert manifest['rows'] == 5
+    assert manifest['last_evaluation_id'] == second[-1].id
+    columns = load_snapshot(directory)
+    assert list(columns['id']) == [e.id for e in first + second]
+    assert list(columns['helpfulness']) == [4] * 5
+    assert write_snapshot(directory)['rows'] == 5
+
+
+def test_refresh_stops_below_unsettled_evaluations(app):
+    directory = app.config['SNAPSHOT_DIR']
+    session = _setup()
+    settled = _rate(session, 1)
+    recent = _rate(session, 1, minutes_ago=0)
+    later = _rate(session, 1)  # settled, but above a row that may still be committing
+
+    manifest = write_snapshot(directory)
+    assert manifest['rows'] == 1
+    assert manifest['last_evaluation_id'] == settled[0].id
+
+    recent[0].created_at = datetime.utcnow() - timedelta(minutes=10)
+    db.session.commit()
+    manifest = write_snapshot(directory)
+    assert manifest['rows'] == 3
+    assert list(load_snapshot(directory)['id']) == [settled[0].id, recent[0].id, later[0].id]
+
+
+def test_full_rewrite(app):
+    directory = app.config['SNAPSHOT_DIR']
+    session = _setup()
+    _rate(session, 4)
+    write_snapshot(directory)
+    assert write_snapshot(directory, full=True)['rows'] == 4